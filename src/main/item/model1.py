@@ -7,20 +7,50 @@ import numpy as np
 import os
 import pickle
 from tqdm import tqdm
+from result_store import save_event_records
+from loader import list_stock_files, iter_stock_files
+from adjust import make_price_reader, price_columns, default_factor_path
 
-def run_model1(file_path, cache_path, start_date_filter, end_date_filter):
+# 事件记录字段（保存到 mainData/results/model1）
+EVENT_SCHEMA = {
+    '交易日期': 'datetime64[ns]',
+    '第1日涨幅': 'float64',
+    '第1日收益': 'float64',
+    '第2日涨幅': 'float64',
+    '第2日收益': 'float64',
+    '第3日涨幅': 'float64',
+    '第3日收益': 'float64',
+    '第4日涨幅': 'float64',
+    '第4日收益': 'float64',
+    '第5日涨幅': 'float64',
+    '第5日收益': 'float64',
+}
+
+# 缓存版本：缓存内容的计算口径改变时加一（v2：炸板按不复权价格和前收盘价判断）
+CACHE_VERSION = 2
+
+def run_model1(file_path, cache_path, start_date_filter, end_date_filter, result_dir=None,
+               price_basis='back', factor_path=None):
+    # 缓存按价格口径和版本分开命名，如 cached_stock_data_back_v2.pkl，旧版本的缓存不再复用
+    root, ext = os.path.splitext(cache_path)
+    cache_path = f"{root}_{price_basis}_v{CACHE_VERSION}{ext}"
     if os.path.exists(cache_path):
         with open(cache_path, 'rb') as f:
             df_all = pickle.load(f)
     else:
         all_stock = []
-        for file in tqdm([f for f in os.listdir(file_path) if f.endswith('.csv')], desc="读取文件"):
+        files = list_stock_files(file_path)
+        # 数据只存不复权价格，复权价格按 price_basis 现算（见 adjust.py）
+        read_func = make_price_reader(price_basis, factor_path or default_factor_path(file_path))
+        cols = price_columns(price_basis)
+        for file, df in tqdm(iter_stock_files(file_path, files, read_func), total=len(files), desc="读取文件"):
             try:
-                df = pd.read_csv(os.path.join(file_path, file), encoding='gbk', parse_dates=['交易日期'])
-                df.sort_values('交易日期', inplace=True)
-                df['前收'] = df['收盘价_复权'].shift(1)
-                df['涨跌幅'] = df['收盘价_复权'] / df['前收'] - 1
-                df['最高涨幅'] = df['最高价_复权'] / df['前收'] - 1
+                if df is None:
+                    continue
+                # 炸板判断用不复权价格，除权除息日用交易所给的前收盘价
+                raw_pre_close = df['前收盘价'] if '前收盘价' in df.columns else df['收盘价'].shift(1)
+                df['涨跌幅'] = df['收盘价'] / raw_pre_close - 1
+                df['最高涨幅'] = df['最高价'] / raw_pre_close - 1
                 df['是否炸板'] = (df['最高涨幅'] >= 0.099) & (df['涨跌幅'] < 0.099) & (df['最高涨幅'] <= 0.105)
                 for idx in df[df['是否炸板']].index:
                     record = {'交易日期': df.at[idx, '交易日期']}
@@ -28,9 +58,9 @@ def run_model1(file_path, cache_path, start_date_filter, end_date_filter):
                         if idx + i + 1 >= len(df):
                             break
                         day = f'第{i+1}日'
-                        open_price = df.at[idx + i + 1, '开盘价_复权']
-                        close_price = df.at[idx + i + 1, '收盘价_复权']
-                        pre_close = df.at[idx + i, '收盘价_复权']
+                        open_price = df.at[idx + i + 1, cols['开盘价']]
+                        close_price = df.at[idx + i + 1, cols['收盘价']]
+                        pre_close = df.at[idx + i, cols['收盘价']]
                         record[f'{day}涨幅'] = (close_price / pre_close - 1) if pd.notna(pre_close) else np.nan
                         record[f'{day}收益'] = (close_price / open_price - 1) if pd.notna(open_price) else np.nan
                     all_stock.append(record)
@@ -44,6 +74,8 @@ def run_model1(file_path, cache_path, start_date_filter, end_date_filter):
     if df_all.empty:
         return "❌ 无有效炸板数据，请检查数据时间范围或数据格式。"
 
+    save_event_records(df_all, 'model1', EVENT_SCHEMA, {'start': start_date_filter, 'end': end_date_filter}, result_dir)
+
     result = pd.DataFrame()
     for i in range(1, 6):
         result.loc[f'第{i}日', '平均涨幅'] = df_all[f'第{i}日涨幅'].mean()
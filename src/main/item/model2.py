@@ -7,6 +7,23 @@ import numpy as np
 import os
 import pickle
 from tqdm import tqdm
+from result_store import save_event_records
+from loader import list_stock_files, iter_stock_files
+
+# 事件记录字段（保存到 mainData/results/model2）
+EVENT_SCHEMA = {
+    '日期': 'datetime64[ns]',
+    '第1日涨幅': 'float64',
+    '第1日收益': 'float64',
+    '第2日涨幅': 'float64',
+    '第2日收益': 'float64',
+    '第3日涨幅': 'float64',
+    '第3日收益': 'float64',
+    '第4日涨幅': 'float64',
+    '第4日收益': 'float64',
+    '第5日涨幅': 'float64',
+    '第5日收益': 'float64',
+}
 
 def safe_read_csv(filepath):
     encodings_to_try = ['utf-8', 'gbk', 'utf-8-sig', 'ISO-8859-1']
@@ -18,16 +35,16 @@ def safe_read_csv(filepath):
     print(f"❌ 文件无法读取：{filepath}")
     return None
 
-def run_model2(file_path, cache_path, start_date_filter, end_date_filter):
+def run_model2(file_path, cache_path, start_date_filter, end_date_filter, result_dir=None):
     if os.path.exists(cache_path):
         print(f"❌ 错误")
         # with open(cache_path, 'rb') as f:
         #     df_all = pickle.load(f)
     else:
         all_stock = []
-        for file in tqdm([f for f in os.listdir(file_path) if f.endswith('.csv')], desc="读取文件"):
+        files = list_stock_files(file_path)
+        for file, df in tqdm(iter_stock_files(file_path, files, safe_read_csv), total=len(files), desc="读取文件"):
             try:
-                df = safe_read_csv(os.path.join(file_path, file))
                 df.sort_values('日期', inplace=True)
                 df['前收'] = df['收盘'].shift(1)
                 df['涨跌幅'] = df['收盘'] / df['前收'] - 1
@@ -55,6 +72,8 @@ def run_model2(file_path, cache_path, start_date_filter, end_date_filter):
     if df_all.empty:
         return "❌ 无有效炸板数据，请检查数据时间范围或数据格式。"
 
+    save_event_records(df_all, 'model2', EVENT_SCHEMA, {'start': start_date_filter, 'end': end_date_filter}, result_dir)
+
     result = pd.DataFrame()
     for i in range(1, 6):
         result.loc[f'第{i}日', '平均涨幅'] = df_all[f'第{i}日涨幅'].mean()
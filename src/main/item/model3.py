@@ -2,12 +2,25 @@
 
 import pandas as pd
 import numpy as np
-import os
 from tqdm import tqdm
+from result_store import save_event_records
 import warnings
+from loader import iter_stock_files
+from security_master import load_security_master, universe_files, DEFAULT_UNIVERSE
+from sampling import run_approximate
 
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
+# 事件记录字段（保存到 mainData/results/model3）
+EVENT_SCHEMA = {
+    '股票代码': 'string',
+    '日期': 'datetime64[ns]',
+    '第4天开盘涨幅': 'float64',
+    '第4天收益': 'float64',
+    '第5天开盘涨幅': 'float64',
+    '第5天收益': 'float64',
+}
+
 def safe_read_csv(filepath):
     encodings_to_try = ['utf-8', 'gbk', 'utf-8-sig', 'ISO-8859-1']
     for enc in encodings_to_try:
@@ -18,19 +31,18 @@ def safe_read_csv(filepath):
     print(f"❌ 文件无法读取：{filepath}")
     return None
 
-def run_drop20_model(file_path, start_date_filter, end_date_filter):
+def _collect_events(file_path, start_date_filter, end_date_filter, universe=None):
     all_stock = []
 
-    for file in tqdm([f for f in os.listdir(file_path) if f.endswith('.csv')], desc="读取文件"):
-        try:
-            code = os.path.splitext(file)[0][:6]
-            # ✅ 排除不可交易股票（非主板，如创业板、科创板、北交所）
-            if not code.isdigit() or len(code) != 6:
-                continue
-            if not (code.startswith('00') or code.startswith('60')):
-                continue
+    # ✅ 按证券主表筛选股票池（默认只要主板），池外文件不读取
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, start=start_date_filter, end=end_date_filter,
+                           **(universe or DEFAULT_UNIVERSE))
+    files = list(codes)
 
-            df = safe_read_csv(os.path.join(file_path, file))
+    for file, df in tqdm(iter_stock_files(file_path, files, safe_read_csv), total=len(files), desc="读取文件"):
+        try:
+            code = codes[file]
             if df is None or df.empty:
                 continue
 
@@ -69,15 +81,30 @@ def run_drop20_model(file_path, start_date_filter, end_date_filter):
             print(f"读取文件 {file} 出错：{e}")
 
     # ==== 整合数据 ====
+    if not all_stock:
+        return pd.DataFrame()
     df_all = pd.DataFrame(all_stock)
-    df_all = df_all[
+    return df_all[
         (df_all['日期'] >= start_date_filter) & (df_all['日期'] <= end_date_filter)
     ]
 
+def run_drop20_model(file_path, start_date_filter, end_date_filter, universe=None, result_dir=None,
+                     sample_frac=None, target_error=None):
+    if sample_frac is not None or target_error is not None:
+        # 抽样估算模式：按 板块 × 流动性 分层抽取部分股票，输出带置信区间的估计
+        return run_approximate(lambda u: _collect_events(file_path, start_date_filter, end_date_filter, u),
+                               file_path, start_date_filter, end_date_filter, None,
+                               ['第4天开盘涨幅', '第4天收益', '第5天开盘涨幅', '第5天收益'],
+                               universe, sample_frac, target_error)
+
+    df_all = _collect_events(file_path, start_date_filter, end_date_filter, universe)
+
     if df_all.empty:
         print("❌ 无满足条件的股票数据。")
         return None
 
+    save_event_records(df_all, 'model3', EVENT_SCHEMA, {'start': start_date_filter, 'end': end_date_filter, 'universe': universe}, result_dir)
+
     # ==== 总数 ====
     print(f"\n🎯 满足3日跌幅 ≥ 20%的可交易股票总数：{len(df_all)} 只")
 
@@ -1,13 +1,26 @@
 # 不同连板涨停买入策略回测结果
 
-import os
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
+from result_store import save_event_records
 import warnings
+from loader import iter_stock_files
+from security_master import load_security_master, universe_files, limit_pct_series, DEFAULT_UNIVERSE
+from sampling import run_approximate
 
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
+# 事件记录字段（保存到 mainData/results/model5）
+EVENT_SCHEMA = {
+    '股票代码': 'string',
+    '日期': 'datetime64[ns]',
+    '买入板数': 'int64',
+    '第2天尾盘卖出': 'float64',
+    '第3天开盘卖出': 'float64',
+    '第3天尾盘卖出': 'float64',
+}
+
 def safe_read_csv(filepath):
     encodings_to_try = ['utf-8', 'gbk', 'utf-8-sig', 'ISO-8859-1']
     for enc in encodings_to_try:
@@ -18,28 +31,28 @@ def safe_read_csv(filepath):
     print(f"❌ 文件无法读取：{filepath}")
     return None
 
-def run_lianban_buy_model(file_path, start_date_filter, end_date_filter):
+def _collect_events(file_path, start_date_filter, end_date_filter, universe=None):
     all_data = []
 
-    for file in tqdm([f for f in os.listdir(file_path) if f.endswith('.csv')], desc="读取文件"):
-        try:
-            code = os.path.splitext(file)[0][:6]
-            # ✅ 排除不可交易股票（非主板，如创业板、科创板、北交所）
-            if not code.isdigit() or len(code) != 6:
-                continue
-            if not (code.startswith('00') or code.startswith('60')):
-                continue
+    # ✅ 按证券主表筛选股票池（默认只要主板），池外文件不读取
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, start=start_date_filter, end=end_date_filter,
+                           **(universe or DEFAULT_UNIVERSE))
+    files = list(codes)
 
-            df = safe_read_csv(os.path.join(file_path, file))
+    for file, df in tqdm(iter_stock_files(file_path, files, safe_read_csv), total=len(files), desc="读取文件"):
+        try:
+            code = codes[file]
             if df is None or df.empty:
                 continue
 
             df.sort_values('日期', inplace=True)
             df.reset_index(drop=True, inplace=True)
+            df['涨停幅度'] = limit_pct_series(master, code, df['日期'])
 
             df['前收'] = df['收盘'].shift(1)
             df['涨幅'] = df['收盘'] / df['前收'] - 1
-            df['是否涨停'] = (df['涨幅'] >= 0.095) & (df['涨幅'] <= 0.105)
+            df['是否涨停'] = (df['涨幅'] >= df['涨停幅度'] - 0.005) & (df['涨幅'] <= df['涨停幅度'] + 0.005)
 
             连板计数 = 0
             for i in range(1, len(df) - 3):
@@ -73,13 +86,28 @@ def run_lianban_buy_model(file_path, start_date_filter, end_date_filter):
         except Exception as e:
             print(f"读取文件 {file} 出错：{e}")
 
+    if not all_data:
+        return pd.DataFrame()
     df_all = pd.DataFrame(all_data)
-    df_all = df_all[(df_all['日期'] >= start_date_filter) & (df_all['日期'] <= end_date_filter)]
+    return df_all[(df_all['日期'] >= start_date_filter) & (df_all['日期'] <= end_date_filter)]
+
+def run_lianban_buy_model(file_path, start_date_filter, end_date_filter, universe=None, result_dir=None,
+                          sample_frac=None, target_error=None):
+    if sample_frac is not None or target_error is not None:
+        # 抽样估算模式：按 板块 × 流动性 分层抽取部分股票，输出带置信区间的估计
+        return run_approximate(lambda u: _collect_events(file_path, start_date_filter, end_date_filter, u),
+                               file_path, start_date_filter, end_date_filter, '买入板数',
+                               ['第2天尾盘卖出', '第3天开盘卖出', '第3天尾盘卖出'],
+                               universe, sample_frac, target_error)
+
+    df_all = _collect_events(file_path, start_date_filter, end_date_filter, universe)
 
     if df_all.empty:
         print("❌ 没有符合连板买入条件的数据")
         return
 
+    save_event_records(df_all, 'model5', EVENT_SCHEMA, {'start': start_date_filter, 'end': end_date_filter, 'universe': universe}, result_dir)
+
     result = pd.DataFrame()
     for b in range(1, 6):
         temp = df_all[df_all['买入板数'] == b]
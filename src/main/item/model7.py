@@ -1,25 +1,46 @@
 # Re-execute the finalized code after environment reset
 
-import os
 import pandas as pd
-import numpy as np
-from tqdm import tqdm
+from result_store import save_event_records
 from tabulate import tabulate
 import warnings
+from pattern import run_pattern
+from sampling import run_approximate
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
-def safe_read_csv(filepath):
-    encodings_to_try = ['utf-8', 'gbk', 'utf-8-sig', 'ISO-8859-1']
-    for enc in encodings_to_try:
-        try:
-            return pd.read_csv(filepath, encoding=enc, parse_dates=['日期'])
-        except Exception:
-            continue
-    print(f"❌ 文件无法读取：{filepath}")
-    return None
+# 事件记录字段（保存到 mainData/results/model7）
+EVENT_SCHEMA = {
+    '股票代码': 'string',
+    '日期': 'datetime64[ns]',
+    '板数': 'string',
+    '首次涨停时间': 'string',
+    '开板次数': 'float64',
+    '封板时长': 'float64',
+    '是否封板': 'boolean',
+    '第2天开盘收益': 'float64',
+    '第2天尾盘收益': 'float64',
+    '第3天开盘收益': 'float64',
+    '第3天尾盘收益': 'float64',
+}
+
+# 形态：两天前涨停、前一天跌 5%~10%、当天触及涨停时按最高价买入，次日/次次日开盘、尾盘卖出
+PATTERN = {
+    'when': [(-2, '是否涨停', True), (-1, '涨幅', (-0.10, -0.05)), (0, '触及涨停', True)],
+    'entry': (0, '最高'),
+    'exits': {
+        '第2天开盘收益': (1, '开盘'),
+        '第2天尾盘收益': (1, '收盘'),
+        '第3天开盘收益': (2, '开盘'),
+        '第3天尾盘收益': (2, '收盘'),
+    },
+    'fields': {'日期': (-1, '日期'), '连板数': (-2, '涨停连板数')},
+    'horizon': 3,
+    # 区分当天是封住涨停还是只是摸板（炸板）
+    'minute': (0, ''),
+}
 
 def format_percent(value, is_rate=False):
     try:
@@ -51,73 +72,30 @@ def format_sign(value, is_rate=False):
     except:
         return "NaN"
 
-def run_fanbao_drop5to10_prev_zt_model(file_path, start_date_filter, end_date_filter):
-    all_data = []
-    for file in tqdm([f for f in os.listdir(file_path) if f.endswith('.csv')], desc="读取文件"):
-        try:
-            code = os.path.splitext(file)[0][:6]
-            if not code.isdigit() or len(code) != 6:
-                continue
-            if not (code.startswith('00') or code.startswith('60')):
-                continue
-
-            df = safe_read_csv(os.path.join(file_path, file))
-            if df is None or df.empty:
-                continue
-
-            df.sort_values('日期', inplace=True)
-            df.reset_index(drop=True, inplace=True)
-
-            df['前收'] = df['收盘'].shift(1)
-            df['涨幅'] = df['收盘'] / df['前收'] - 1
-            df['是否涨停'] = (df['涨幅'] >= 0.095) & (df['涨幅'] <= 0.105)
-            df['涨停连板数'] = 0
-
-            for i in range(1, len(df)):
-                if df.at[i, '是否涨停']:
-                    df.at[i, '涨停连板数'] = df.at[i - 1, '涨停连板数'] + 1 if df.at[i - 1, '是否涨停'] else 1
-
-            for i in range(2, len(df) - 3):
-                if not df.at[i - 2, '是否涨停']:
-                    continue
-                if not (-0.10 <= df.at[i - 1, '涨幅'] <= -0.05):
-                    continue
-
-                today_high, today_pre_close, today_close = df.at[i, '最高'], df.at[i, '前收'], df.at[i, '收盘']
-                if pd.isna(today_high) or pd.isna(today_pre_close) or pd.isna(today_close):
-                    continue
-
-                limit_price = round(today_pre_close * 1.095, 2)
-                if not (round(today_close, 2) >= limit_price or round(today_high, 2) >= limit_price):
-                    continue
-
-                连板数 = int(df.at[i - 2, '涨停连板数'])
-                record = {
-                    '股票代码': code,
-                    '日期': df.at[i - 1, '日期'],
-                    '板数': f"{连板数}板" if 1 <= 连板数 <= 5 else "其他",
-                }
-
-                buy_price = today_high
-                if i + 1 < len(df):
-                    open2, close2 = df.at[i + 1, '开盘'], df.at[i + 1, '收盘']
-                    record['第2天开盘收益'] = (open2 / buy_price - 1) if pd.notna(open2) and buy_price else np.nan
-                    record['第2天尾盘收益'] = (close2 / buy_price - 1) if pd.notna(close2) and buy_price else np.nan
-                if i + 2 < len(df):
-                    open3, close3 = df.at[i + 2, '开盘'], df.at[i + 2, '收盘']
-                    record['第3天开盘收益'] = (open3 / buy_price - 1) if pd.notna(open3) and buy_price else np.nan
-                    record['第3天尾盘收益'] = (close3 / buy_price - 1) if pd.notna(close3) and buy_price else np.nan
-
-                all_data.append(record)
-        except Exception as e:
-            print(f"读取文件 {file} 出错：{e}")
-
-    df_all = pd.DataFrame(all_data)
-    df_all = df_all[(df_all['日期'] >= start_date_filter) & (df_all['日期'] <= end_date_filter)]
+def _collect_events(file_path, start_date_filter, end_date_filter, minute_path=None, universe=None):
+    df_all = run_pattern(file_path, PATTERN, start_date_filter, end_date_filter, minute_path, universe)
+    if not df_all.empty:
+        连板数 = df_all.pop('连板数').astype(int)
+        df_all.insert(2, '板数', (连板数.astype(str) + '板').where(连板数.between(1, 5), '其他'))
+    return df_all
+
+def run_fanbao_drop5to10_prev_zt_model(file_path, start_date_filter, end_date_filter, minute_path=None, universe=None, result_dir=None,
+                                       sample_frac=None, target_error=None):
+    if sample_frac is not None or target_error is not None:
+        # 抽样估算模式：按 板块 × 流动性 分层抽取部分股票，输出带置信区间的估计
+        return run_approximate(lambda u: _collect_events(file_path, start_date_filter, end_date_filter, minute_path, u),
+                               file_path, start_date_filter, end_date_filter, '板数',
+                               ['第2天开盘收益', '第2天尾盘收益', '第3天开盘收益', '第3天尾盘收益'],
+                               universe, sample_frac, target_error)
+
+    df_all = _collect_events(file_path, start_date_filter, end_date_filter, minute_path, universe)
+
     if df_all.empty:
         print("❌ 没有符合条件的数据")
         return
 
+    save_event_records(df_all, 'model7', EVENT_SCHEMA, {'start': start_date_filter, 'end': end_date_filter, 'universe': universe, 'minute_path': minute_path}, result_dir)
+
     def calc_stats(df, col):
         avg = df[col].mean()
         win_rate = (df[col] > 0).mean()
@@ -162,6 +140,13 @@ def run_fanbao_drop5to10_prev_zt_model(file_path, start_date_filter, end_date_fi
 
     print(tabulate(grouped_fmt, headers='keys', tablefmt='psql', stralign='center'))
 
+    if '是否封板' in df_all.columns and df_all['是否封板'].notna().any():
+        sealed_df = df_all[df_all['是否封板'].notna()].copy()
+        sealed_df['封板类型'] = sealed_df['是否封板'].map({True: '封板', False: '炸板'})
+        print("\n📊 按当天封板/炸板区分（分钟数据）：")
+        print(sealed_df.groupby('封板类型')[['第2天开盘收益', '第2天尾盘收益', '第3天开盘收益', '第3天尾盘收益']].mean()
+              .to_string(float_format="{:.2%}".format))
+
     sample_size = min(10, len(df_all))
     print("\n🔍 随机抽取10条原始记录供验证：")
     sample_df = df_all.sample(n=sample_size, random_state=42)
@@ -0,0 +1,177 @@
+# 复权方法
+# 只存一份不复权价格 + 每只股票精简的复权因子变动表，
+# 前复权/后复权价格在模型需要时才计算并缓存
+# 只用于 交易日期/开盘价/... 格式的数据（model1、other/qita.py）；model2~7 读 data_年份 目录，价格口径以文件为准
+
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from tqdm import tqdm
+from loader import list_stock_files, iter_stock_files
+
+# 价格列（不复权），复权列为 列名 + '_复权'
+PRICE_COLUMNS = ['开盘价', '最高价', '最低价', '收盘价']
+ADJ_SUFFIX = '_复权'
+DATE_COLUMN = '交易日期'
+FACTOR_FILE = 'adj_factors.csv'
+# 没有 前收盘价 列时，复权因子相对前一天变动超过此比例才视为除权
+FACTOR_TOLERANCE = 1e-4
+
+# 价格口径：raw 不复权 / forward 前复权 / back 后复权
+PRICE_BASIS = ('raw', 'forward', 'back')
+
+# 复权价格缓存：(代码, 口径) → 复权后的价格列
+_VIEW_CACHE = OrderedDict()
+_VIEW_CACHE_SIZE = 256
+_CACHE_LOCK = threading.Lock()
+_FACTOR_CACHE = {}
+
+
+def price_columns(basis: str) -> dict:
+    """
+    某个口径下的价格列名，如 {'收盘价': '收盘价_复权'}，模型按此取列即可切换口径
+    """
+    if basis not in PRICE_BASIS:
+        raise ValueError(f"价格口径只能是 {PRICE_BASIS}，收到：{basis}")
+    return {c: c if basis == 'raw' else c + ADJ_SUFFIX for c in PRICE_COLUMNS}
+
+
+def default_factor_path(file_path: str) -> str:
+    """
+    默认复权因子文件位置：数据目录的上一级
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), FACTOR_FILE)
+
+
+def extract_adj_factors(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    从同时带不复权和复权价格的数据中提取复权因子，只保留因子变动的日期
+    除权日优先按 前收盘价 与上一日收盘价不一致判断，没有 前收盘价 列时按因子相对变动超过 FACTOR_TOLERANCE 判断；
+    两个除权日之间的因子取中位数，消除复权价格四舍五入带来的抖动
+    :return: 列为 交易日期/复权因子
+    """
+    factor = df['收盘价' + ADJ_SUFFIX] / df['收盘价']
+    valid = factor.notna()
+    df, factor = df[valid], factor[valid]
+    if factor.empty:
+        return pd.DataFrame({DATE_COLUMN: pd.Series(dtype='datetime64[ns]'), '复权因子': pd.Series(dtype=float)})
+    if '前收盘价' in df.columns:
+        prev_close = df['收盘价'].shift(1)
+        changed = df['前收盘价'].fillna(prev_close).round(3).ne(prev_close.round(3))
+    else:
+        tolerance = pd.Series(FACTOR_TOLERANCE, index=df.index)
+        adj_close = df['收盘价' + ADJ_SUFFIX]
+        if ((adj_close * 100).round(6) % 1 == 0).all():
+            # 复权价格只到分：相邻两天的因子仅因四舍五入就可能相差 0.01/复权价 + 0.01/价格
+            tolerance += 0.01 / adj_close + 0.01 / df['收盘价']
+        changed = (factor / factor.shift(1) - 1).abs() > tolerance
+    changed.iloc[0] = True
+    segment = changed.cumsum()
+    return pd.DataFrame({DATE_COLUMN: df.loc[changed, DATE_COLUMN].values,
+                         '复权因子': factor.groupby(segment).median().round(8).values})
+
+
+def ingest_price_dir(src_path: str, raw_path: str, factor_path: str = None):
+    """
+    把带复权列的数据目录转换为：不复权价格文件 + 一个复权因子文件
+    :param src_path: 原数据目录（含 *_复权 列）
+    :param raw_path: 输出的不复权数据目录
+    :param factor_path: 复权因子文件，默认 raw_path 上一级的 adj_factors.csv
+    """
+    factor_path = factor_path or default_factor_path(raw_path)
+    os.makedirs(raw_path, exist_ok=True)
+    read_func = lambda path: pd.read_csv(path, encoding='gbk', parse_dates=[DATE_COLUMN])
+    files = list_stock_files(src_path)
+
+    factors = []
+    for file, df in tqdm(iter_stock_files(src_path, files, read_func), total=len(files), desc="拆分复权因子"):
+        if df is None or df.empty:
+            continue
+        df = df.sort_values(DATE_COLUMN).reset_index(drop=True)
+        events = extract_adj_factors(df)
+        events.insert(0, '代码', os.path.splitext(file)[0])
+        factors.append(events)
+        df.drop(columns=[c + ADJ_SUFFIX for c in PRICE_COLUMNS if c + ADJ_SUFFIX in df.columns]) \
+          .to_csv(os.path.join(raw_path, file), index=False, encoding='gbk')
+
+    pd.concat(factors, ignore_index=True).to_csv(factor_path, index=False, encoding='utf-8-sig')
+    _FACTOR_CACHE.pop(factor_path, None)
+    print(f"✅ 已写入不复权数据 {len(factors)} 个，复权因子：{factor_path}")
+
+
+def load_adj_factors(factor_path: str) -> dict:
+    """
+    读取复权因子文件（进程内缓存）
+    :return: {代码: 因子变动表}
+    """
+    if factor_path not in _FACTOR_CACHE:
+        table = pd.read_csv(factor_path, encoding='utf-8-sig', dtype={'代码': str}, parse_dates=[DATE_COLUMN])
+        _FACTOR_CACHE[factor_path] = {code: g.drop(columns='代码').reset_index(drop=True)
+                                      for code, g in table.groupby('代码')}
+    return _FACTOR_CACHE[factor_path]
+
+
+def adjust_prices(df: pd.DataFrame, events: pd.DataFrame, basis: str) -> pd.DataFrame:
+    """
+    用因子变动表计算复权价格
+    :param basis: forward 前复权（最新价格不变）/ back 后复权（最早价格不变）
+    :return: 复权价格列（列名带 _复权）
+    """
+    dates = df[[DATE_COLUMN]].reset_index()
+    factor = pd.merge_asof(dates.sort_values(DATE_COLUMN), events.sort_values(DATE_COLUMN), on=DATE_COLUMN) \
+        .set_index('index')['复权因子'].reindex(df.index)
+    # 第一个因子之前的日期按第一个因子处理
+    factor = factor.fillna(events['复权因子'].iloc[0])
+    base = events['复权因子'].iloc[-1] if basis == 'forward' else events['复权因子'].iloc[0]
+    return pd.DataFrame({c + ADJ_SUFFIX: df[c] * factor / base for c in PRICE_COLUMNS}, index=df.index)
+
+
+def with_price_basis(df: pd.DataFrame, code: str, basis: str, factor_path: str = None) -> pd.DataFrame:
+    """
+    按口径补上复权价格列；raw 口径、或 back 口径且数据自带复权列时原样返回
+    结果按 (代码, 口径) 缓存，同一只股票重复请求不再计算
+    """
+    price_columns(basis)
+    if basis == 'raw':
+        return df
+    if basis == 'back' and all(c + ADJ_SUFFIX in df.columns for c in PRICE_COLUMNS):
+        return df
+
+    key = (code, basis, len(df), df[DATE_COLUMN].iloc[-1] if len(df) else None)
+    with _CACHE_LOCK:
+        adjusted = _VIEW_CACHE.get(key)
+        if adjusted is not None:
+            _VIEW_CACHE.move_to_end(key)
+    if adjusted is None:
+        events = None
+        if factor_path and os.path.exists(factor_path):
+            with _CACHE_LOCK:
+                events = load_adj_factors(factor_path).get(code)
+        if events is None and '收盘价' + ADJ_SUFFIX in df.columns:
+            # 旧格式数据自带复权列，直接从中提取因子
+            events = extract_adj_factors(df)
+        if events is None or events.empty:
+            # 没有复权因子视为从未除权
+            adjusted = pd.DataFrame({c + ADJ_SUFFIX: df[c] for c in PRICE_COLUMNS}, index=df.index)
+        else:
+            adjusted = adjust_prices(df, events, basis)
+        with _CACHE_LOCK:
+            _VIEW_CACHE[key] = adjusted
+            if len(_VIEW_CACHE) > _VIEW_CACHE_SIZE:
+                _VIEW_CACHE.popitem(last=False)
+
+    df = df.drop(columns=[c for c in adjusted.columns if c in df.columns])
+    return pd.concat([df, adjusted.set_axis(df.index)], axis=1)
+
+
+def make_price_reader(basis: str = 'back', factor_path: str = None, encoding: str = 'gbk'):
+    """
+    生成 loader.iter_stock_files 用的读取函数：读不复权文件并按口径补上复权列
+    """
+    def read_func(path):
+        df = pd.read_csv(path, encoding=encoding, parse_dates=[DATE_COLUMN])
+        df = df.sort_values(DATE_COLUMN).reset_index(drop=True)
+        code = os.path.splitext(os.path.basename(path))[0]
+        return with_price_basis(df, code, basis, factor_path)
+    return read_func
@@ -0,0 +1,122 @@
+# 数据加载方法
+# 线程池预读取股票文件：当前股票在主线程计算时，后续 K 个文件已在后台读取解析，
+# 在途数量受 prefetch 限制（背压），避免读太快把内存撑爆
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+
+# 默认预读取数量和读取线程数
+DEFAULT_PREFETCH = 8
+DEFAULT_WORKERS = 4
+
+# 数据文件依次尝试的编码
+ENCODINGS = ['utf-8', 'gbk', 'utf-8-sig', 'ISO-8859-1']
+
+
+def list_stock_files(file_path: str) -> list:
+    """
+    列出数据目录下所有 csv 文件
+    """
+    return [f for f in os.listdir(file_path) if f.endswith('.csv')]
+
+
+def guess_encoding(data: bytes) -> str:
+    """
+    按一段字节（只取其中完整的行，避免截断多字节字符）判断编码
+    """
+    complete = data[:data.rfind(b'\n') + 1] or data
+    for enc in ENCODINGS:
+        try:
+            complete.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def detect_encoding(path: str, size: int = 1 << 16) -> str:
+    """
+    按文件开头判断编码
+    """
+    with open(path, 'rb') as f:
+        return guess_encoding(f.read(size))
+
+
+def read_csv_any(filepath_or_buffer, **kwargs) -> pd.DataFrame:
+    """
+    按 ENCODINGS 依次尝试读取 csv，全部失败时抛出最后一次的异常
+    :param kwargs: 透传给 pd.read_csv
+    """
+    error = None
+    for enc in ENCODINGS:
+        if hasattr(filepath_or_buffer, 'seek'):
+            filepath_or_buffer.seek(0)
+        try:
+            return pd.read_csv(filepath_or_buffer, encoding=enc, **kwargs)
+        except Exception as e:
+            error = e
+    raise error
+
+
+def safe_read_csv(filepath):
+    """
+    读取日线 csv（日期列解析为日期），读取失败返回 None
+    """
+    try:
+        return read_csv_any(filepath, parse_dates=['日期'])
+    except Exception:
+        print(f"❌ 文件无法读取：{filepath}")
+        return None
+
+
+def _read_one(file_path, file, read_func):
+    try:
+        return file, read_func(os.path.join(file_path, file))
+    except Exception as e:
+        print(f"读取文件 {file} 出错：{e}")
+        return file, None
+
+
+def iter_stock_files(file_path: str, files: list, read_func, prefetch: int = DEFAULT_PREFETCH,
+                     max_workers: int = DEFAULT_WORKERS, ordered: bool = True):
+    """
+    流水线读取股票文件，供 run_* 循环直接迭代
+    :param file_path: 数据目录
+    :param files: 要读取的文件名列表
+    :param read_func: 读取函数，参数为完整路径，返回 DataFrame（读取失败返回 None）
+    :param prefetch: 最多同时在途（读取中 + 已读完未消费）的文件数
+    :param max_workers: 读取线程数
+    :param ordered: True 按 files 顺序返回；False 谁先读完先返回
+    :return: 生成器，每次返回 (文件名, DataFrame)，读取出错时 DataFrame 为 None
+    """
+    files_iter = iter(files)
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit_next():
+        file = next(files_iter, None)
+        if file is None:
+            return False
+        pending.append(pool.submit(_read_one, file_path, file, read_func))
+        return True
+
+    try:
+        for _ in range(max(prefetch, 1)):
+            if not submit_next():
+                break
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            # 取走一个就补一个，在途数量始终不超过 prefetch
+            submit_next()
+            yield future.result()
+    finally:
+        # 提前退出循环时取消未开始的读取
+        pool.shutdown(wait=False, cancel_futures=True)
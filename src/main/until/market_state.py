@@ -0,0 +1,198 @@
+# 市场情绪方法
+# 全市场逐日情绪表：涨停数、跌停数、炸板数、炸板率、最高连板、昨日涨停溢价，
+# 增量更新，回测结果按日期关联后即可按情绪分组
+
+import os
+import io
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from loader import iter_stock_files, safe_read_csv, read_csv_any
+from pattern import add_limit_flags
+from security_master import load_security_master, universe_files, limit_pct_series
+from result_store import summarize_events
+
+STATE_COLUMNS = ['涨停数', '跌停数', '炸板数', '炸板率', '最高连板', '昨日涨停溢价']
+
+# 默认保存位置：mainData/market_state.csv
+DEFAULT_STATE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'mainData', 'market_state.csv')
+)
+
+_SUM_COLUMNS = ['涨停数', '跌停数', '炸板数', '溢价合计', '溢价样本数']
+# 情绪表额外保存的累加列，下次增量更新时在其上累加
+_EXTRA_COLUMNS = ['溢价合计', '溢价样本数']
+
+
+def stock_daily_flags(df: pd.DataFrame, limit_pct: pd.Series, prev: dict = None) -> pd.DataFrame:
+    """
+    单只股票逐日的涨停/跌停/炸板/连板标记，涨停和炸板口径与 pattern.add_limit_flags（model3~7）一致
+    :param df: 日线数据（已按日期排序）
+    :param limit_pct: 每日涨跌幅限制
+    :param prev: 上次更新时保存的该股状态（日期、收盘、是否涨停、连板数），df 只含新增行时用来接上
+    :return: index 为日期，列为 _SUM_COLUMNS 与 连板数
+    """
+    bars = df[['日期', '收盘', '最高']].assign(涨停幅度=limit_pct.values)
+    if prev:
+        # 在前面补一行上次的收盘，新增的第一行才有前收
+        seed = pd.DataFrame({'日期': [prev['日期']], '收盘': [prev['收盘']], '最高': [prev['收盘']], '涨停幅度': [np.nan]})
+        bars = pd.concat([seed, bars], ignore_index=True)
+    bars = add_limit_flags(bars)
+
+    is_up = bars['是否涨停']
+    is_down = bars['涨幅'] <= -(bars['涨停幅度'] - 0.005)
+    prev_up = is_up.shift(1, fill_value=False)
+    streak = bars['涨停连板数']
+    if prev:
+        prev_up.iloc[1] = bool(prev['是否涨停'])
+        # 开头连续涨停的部分接上之前的连板数
+        streak = streak + ((~is_up).cumsum() == 1) * is_up * prev['连板数']
+        bars, is_up, is_down, prev_up, streak = (x.iloc[1:] for x in (bars, is_up, is_down, prev_up, streak))
+
+    flags = pd.DataFrame({
+        '涨停数': is_up.astype(int),
+        '跌停数': is_down.astype(int),
+        '炸板数': bars['是否炸板'].astype(int),
+        '溢价合计': bars['涨幅'].where(prev_up, 0.0).fillna(0.0),
+        '溢价样本数': (prev_up & bars['涨幅'].notna()).astype(int),
+        '连板数': streak,
+    })
+    flags.index = bars['日期'].values
+    return flags
+
+
+def _stocks_path(state_path: str) -> str:
+    # 每只股票的续算状态：mainData/market_state_stocks.pkl
+    return os.path.splitext(state_path)[0] + '_stocks.pkl'
+
+
+def _read_new_rows(path: str, prev: dict):
+    """
+    只读上次更新之后追加到文件末尾的行；文件被改写（变短、或新行日期不在上次之后）时整表重读
+    :return: (日线数据, 是否只含新增行, 已读到的文件大小)
+    """
+    size = os.path.getsize(path)
+    if prev and prev['offset'] <= size:
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(prev['offset'])
+            tail = f.read()
+        if not tail.strip():
+            return None, True, size
+        try:
+            df = read_csv_any(io.BytesIO(header + tail), parse_dates=['日期'])
+        except Exception:
+            df = None
+        if df is not None and not df.empty and df['日期'].min() > prev['日期']:
+            return df, True, size
+    return safe_read_csv(path), False, size
+
+
+def load_market_state(state_path: str = None) -> pd.DataFrame:
+    """
+    读取情绪表（index 为日期），不存在返回空表
+    """
+    state_path = state_path or DEFAULT_STATE_PATH
+    if not os.path.exists(state_path):
+        return pd.DataFrame(columns=STATE_COLUMNS, index=pd.DatetimeIndex([], name='日期'))
+    return pd.read_csv(state_path, encoding='utf-8-sig', parse_dates=['日期'], index_col='日期')
+
+
+def update_market_state(file_path: str, state_path: str = None, universe: dict = None, rebuild: bool = False) -> pd.DataFrame:
+    """
+    增量更新情绪表：每只股票只读上次更新之后追加的行，按日期累加到已有的汇总上
+    （同一天的日线分几批写入文件也不会漏算）
+    :param file_path: 日线数据目录
+    :param universe: 股票池筛选条件，默认全市场
+    :param rebuild: True 时从头重算
+    """
+    state_path = state_path or DEFAULT_STATE_PATH
+    state = load_market_state(state_path)
+    stocks_path = _stocks_path(state_path)
+    stocks = pd.read_pickle(stocks_path) if os.path.exists(stocks_path) else {}
+    # 没有续算状态或累加列（旧格式）时无法在已有汇总上累加，从头重算
+    if rebuild or not len(state) or not stocks or not set(_SUM_COLUMNS) <= set(state.columns):
+        state, stocks = pd.DataFrame(columns=STATE_COLUMNS + _EXTRA_COLUMNS, index=pd.DatetimeIndex([], name='日期')), {}
+
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, **(universe or {}))
+    files = list(codes)
+    read_func = lambda path: _read_new_rows(path, stocks.get(codes[os.path.basename(path)]))
+
+    sums = pd.DataFrame(columns=_SUM_COLUMNS, dtype=float)
+    heights = pd.Series(dtype=float)
+    for file, result in tqdm(iter_stock_files(file_path, files, read_func), total=len(files), desc="更新情绪表"):
+        df, incremental, size = result if result is not None else (None, False, 0)
+        if df is None or df.empty:
+            continue
+        code = codes[file]
+        prev = stocks.get(code)
+        df = df.sort_values('日期').reset_index(drop=True)
+        flags = stock_daily_flags(df, limit_pct_series(master, code, df['日期']), prev if incremental else None)
+        stocks[code] = {
+            'offset': size,
+            '日期': df['日期'].iloc[-1],
+            '收盘': df['收盘'].iloc[-1],
+            '是否涨停': bool(flags['涨停数'].iloc[-1]),
+            '连板数': int(flags['连板数'].iloc[-1]),
+        }
+        if prev and not incremental:
+            # 文件被改写后整表重读：该股上次已计入的日期不再重复累加
+            flags = flags[flags.index > prev['日期']]
+        if flags.empty:
+            continue
+        # 逐只累加，内存只保留按日期汇总的结果
+        flags = flags[~flags.index.duplicated(keep='last')]
+        sums = sums.add(flags[_SUM_COLUMNS], fill_value=0)
+        heights = pd.concat([heights, flags['连板数']], axis=1).max(axis=1)
+
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    pd.to_pickle(stocks, stocks_path)
+    if sums.empty:
+        print("✅ 情绪表已是最新")
+        return state
+
+    # 新增的行加到已有日期上（或新建日期），再重算比率列
+    dates = sums.index
+    old = state.reindex(dates)
+    totals = old[_SUM_COLUMNS].fillna(0).add(sums.reindex(dates, fill_value=0))
+    new_state = pd.DataFrame(index=dates)
+    new_state['涨停数'] = totals['涨停数'].astype(int)
+    new_state['跌停数'] = totals['跌停数'].astype(int)
+    new_state['炸板数'] = totals['炸板数'].astype(int)
+    new_state['炸板率'] = totals['炸板数'] / (totals['涨停数'] + totals['炸板数'])
+    new_state['最高连板'] = pd.concat([old['最高连板'], heights.reindex(dates)], axis=1).max(axis=1).fillna(0).astype(int)
+    new_state['昨日涨停溢价'] = totals['溢价合计'] / totals['溢价样本数'].where(totals['溢价样本数'] > 0)
+    new_state['溢价合计'] = totals['溢价合计']
+    new_state['溢价样本数'] = totals['溢价样本数'].astype(int)
+    new_state.index.name = '日期'
+
+    added = len(dates.difference(state.index))
+    state = pd.concat([state.drop(index=state.index.intersection(dates)), new_state]).sort_index() \
+        if len(state) else new_state.sort_index()
+    state[STATE_COLUMNS + _EXTRA_COLUMNS].to_csv(state_path, encoding='utf-8-sig', date_format='%Y-%m-%d')
+    print(f"✅ 情绪表新增 {added} 个交易日，更新 {len(dates) - added} 个交易日")
+    return state
+
+
+def attach_market_state(df_all: pd.DataFrame, state: pd.DataFrame, date_col: str = '日期', lag: int = 0) -> pd.DataFrame:
+    """
+    按日期把情绪表关联到事件记录
+    :param date_col: 事件记录中用于关联的日期列
+    :param lag: 取前 lag 个交易日的情绪（避免用到当天收盘后才知道的数据）
+    """
+    state = state[STATE_COLUMNS].shift(lag) if lag else state[STATE_COLUMNS]
+    return df_all.merge(state, how='left', left_on=date_col, right_index=True)
+
+
+def slice_by_state(df_all: pd.DataFrame, state: pd.DataFrame, by: str, values: list, bins=None,
+                   date_col: str = '日期', lag: int = 0) -> pd.DataFrame:
+    """
+    按情绪分组统计事件收益
+    :param by: 情绪列，如 '炸板率'、'最高连板'
+    :param values: 收益列
+    :param bins: 分箱边界，如 [0, 0.2, 0.4, 1]；为空时按原值分组
+    """
+    df = attach_market_state(df_all, state, date_col, lag)
+    key = pd.cut(df[by], bins) if bins is not None else df[by]
+    return summarize_events(df.assign(**{by: key}), by, values)
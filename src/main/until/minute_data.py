@@ -0,0 +1,213 @@
+# 分钟数据方法
+# 1分钟K线按 (股票, 月份) 分块压缩存储，支持按时间区间流式读取，
+# 并计算涨停相关的日内特征（首次涨停时间、开板次数、封板时长、开盘即涨停），回写为日线列
+
+import os
+import pandas as pd
+import numpy as np
+from loader import detect_encoding
+
+# 分钟数据列
+MINUTE_COLUMNS = ['时间', '开盘', '收盘', '最高', '最低', '成交量', '成交额']
+
+# 回写到日线的特征列
+MINUTE_FEATURE_COLUMNS = ['首次涨停时间', '开板次数', '封板时长', '是否封板', '开盘即涨停']
+
+# 分块文件后缀（gzip 压缩的 pickle）
+CHUNK_SUFFIX = '.pkl.gz'
+FEATURE_FILE = 'features.pkl'
+
+
+def minute_chunk_path(minute_path: str, code: str, month: str) -> str:
+    """
+    分块文件路径：minute_path/股票代码/YYYYMM.pkl.gz
+    """
+    return os.path.join(minute_path, code, f"{month}{CHUNK_SUFFIX}")
+
+
+def list_minute_months(minute_path: str, code: str) -> list:
+    """
+    列出某只股票已存储的月份（升序）
+    """
+    stock_dir = os.path.join(minute_path, code)
+    if not os.path.isdir(stock_dir):
+        return []
+    return sorted(f[:-len(CHUNK_SUFFIX)] for f in os.listdir(stock_dir) if f.endswith(CHUNK_SUFFIX))
+
+
+def write_minute_bars(minute_path: str, code: str, bars: pd.DataFrame):
+    """
+    按月写入分钟数据，已有分块会合并去重（同一时间以新数据为准）
+    :param minute_path: 分钟数据根目录
+    :param code: 股票代码
+    :param bars: 分钟数据，至少包含 MINUTE_COLUMNS 中的 时间/开盘/收盘/最高/最低
+    """
+    if bars is None or bars.empty:
+        return
+    os.makedirs(os.path.join(minute_path, code), exist_ok=True)
+    bars = bars[[c for c in MINUTE_COLUMNS if c in bars.columns]].copy()
+    bars['时间'] = pd.to_datetime(bars['时间'])
+
+    for month, chunk in bars.groupby(bars['时间'].dt.strftime('%Y%m')):
+        path = minute_chunk_path(minute_path, code, month)
+        if os.path.exists(path):
+            chunk = pd.concat([pd.read_pickle(path), chunk], ignore_index=True)
+        chunk = chunk.drop_duplicates('时间', keep='last').sort_values('时间').reset_index(drop=True)
+        chunk.to_pickle(path, compression='gzip')
+
+
+def import_minute_csv(minute_path: str, csv_path: str, code: str = None, chunksize: int = 240 * 20):
+    """
+    流式导入单只股票的分钟 CSV，按 chunksize 行分批读取，不整表加载
+    :param csv_path: 分钟 CSV 文件路径
+    :param code: 股票代码，默认取文件名前6位
+    :param chunksize: 每批读取行数，默认约一个月
+    """
+    code = code or os.path.splitext(os.path.basename(csv_path))[0][:6]
+    try:
+        # 分批读取无法换编码重试，先按文件开头判断编码
+        for chunk in pd.read_csv(csv_path, encoding=detect_encoding(csv_path), parse_dates=['时间'], chunksize=chunksize):
+            write_minute_bars(minute_path, code, chunk)
+        return True
+    except UnicodeDecodeError:
+        print(f"❌ 文件无法读取：{csv_path}")
+        return False
+
+
+def iter_minute_bars(minute_path: str, code: str, start=None, end=None):
+    """
+    按月流式读取分钟数据，只打开与 [start, end] 有交集的分块
+    :return: 生成器，每次返回一个月（已按时间区间截取）的 DataFrame
+    """
+    start = pd.to_datetime(start) if start is not None else None
+    end = pd.to_datetime(end) if end is not None else None
+    # end 为日期时包含当天全部分钟
+    if end is not None and end == end.normalize():
+        end = end + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+    for month in list_minute_months(minute_path, code):
+        month_start = pd.to_datetime(month, format='%Y%m')
+        if start is not None and month_start + pd.offsets.MonthBegin(1) <= start:
+            continue
+        if end is not None and month_start > end:
+            break
+        bars = pd.read_pickle(minute_chunk_path(minute_path, code, month))
+        if start is not None:
+            bars = bars[bars['时间'] >= start]
+        if end is not None:
+            bars = bars[bars['时间'] <= end]
+        if not bars.empty:
+            yield bars
+
+
+def read_minute_bars(minute_path: str, code: str, start=None, end=None) -> pd.DataFrame:
+    """
+    读取一段时间内的分钟数据（区间应较短，长区间请用 iter_minute_bars）
+    """
+    chunks = list(iter_minute_bars(minute_path, code, start, end))
+    if not chunks:
+        return pd.DataFrame(columns=MINUTE_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def calc_limit_features(bars: pd.DataFrame, limit_price: pd.Series) -> pd.DataFrame:
+    """
+    计算分钟级涨停特征（向量化，按日分组）
+    :param bars: 分钟数据
+    :param limit_price: 涨停价，index 为日期
+    :return: index 为日期，列为 MINUTE_FEATURE_COLUMNS
+    """
+    bars = bars.copy()
+    bars['日期'] = bars['时间'].dt.normalize()
+    bars['涨停价'] = bars['日期'].map(limit_price)
+    bars = bars[bars['涨停价'].notna()]
+    if bars.empty:
+        return pd.DataFrame(columns=MINUTE_FEATURE_COLUMNS)
+
+    # 触及：分钟最高价到涨停价；封住：分钟收盘价在涨停价
+    touched = bars['最高'].round(2) >= bars['涨停价']
+    sealed = bars['收盘'].round(2) >= bars['涨停价']
+    prev_sealed = sealed.groupby(bars['日期']).shift(1, fill_value=False).astype(bool)
+    breaks = prev_sealed & ~sealed
+
+    grouped = bars.groupby('日期')
+    features = pd.DataFrame(index=grouped.size().index)
+    first_touch = bars.loc[touched, ['日期', '时间']].groupby('日期')['时间'].min()
+    features['首次涨停时间'] = first_touch.dt.strftime('%H:%M').reindex(features.index)
+    features['开板次数'] = breaks.groupby(bars['日期']).sum().astype(int)
+    features['封板时长'] = sealed.groupby(bars['日期']).sum().astype(int)
+    features['是否封板'] = sealed.groupby(bars['日期']).last().astype(bool)
+    # 开盘即涨停：当天第一根分钟线的开盘价就在涨停价（不依赖分钟线按开始还是结束时间标记）
+    first_bar = bars.sort_values('时间').groupby('日期').head(1).set_index('日期')
+    features['开盘即涨停'] = (first_bar['开盘'].round(2) >= first_bar['涨停价']).reindex(features.index)
+    features.index.name = '日期'
+    return features
+
+
+def _month_signature(minute_path: str, code: str, month: str, limit_price: pd.Series) -> tuple:
+    """
+    月份分块的签名：分块文件的修改时间、大小，以及该月涨停价的哈希
+    任一变化（追加了分钟数据、日线或涨跌幅限制变了）都需要重算该月
+    """
+    stat = os.stat(minute_chunk_path(minute_path, code, month))
+    month_limit = limit_price[limit_price.index.strftime('%Y%m') == month]
+    limit_hash = int(pd.util.hash_pandas_object(month_limit, index=True).sum()) if len(month_limit) else 0
+    return stat.st_mtime_ns, stat.st_size, limit_hash
+
+
+def build_minute_features(minute_path: str, code: str, daily: pd.DataFrame, limit_pct: float = 0.1) -> pd.DataFrame:
+    """
+    逐月计算并缓存分钟特征，分块和涨停价都没变的月份直接复用（增量）
+    :param daily: 日线数据，需包含 日期/收盘，用于计算涨停价
+    :param limit_pct: 涨停幅度
+    """
+    daily = daily.sort_values('日期')
+    # 日线已有逐日涨跌幅限制（见 security_master.limit_pct_series）时优先使用
+    pct = daily['涨停幅度'] if '涨停幅度' in daily.columns else limit_pct
+    limit_price = ((daily['收盘'].shift(1) * (1 + pct)).round(2)).set_axis(pd.to_datetime(daily['日期']).values)
+
+    # 缓存：{'months': {月份: 签名}, 'features': 特征表}；已处理的月份单独记录，没有涨停日的月份也不会重复计算
+    feature_path = os.path.join(minute_path, code, FEATURE_FILE)
+    cache = pd.read_pickle(feature_path) if os.path.exists(feature_path) else None
+    if not isinstance(cache, dict) or not set(MINUTE_FEATURE_COLUMNS) <= set(cache['features'].columns):
+        # 旧格式或特征列有增加时全部重算
+        cache = {'months': {}, 'features': pd.DataFrame(columns=MINUTE_FEATURE_COLUMNS)}
+    months = list_minute_months(minute_path, code)
+    signatures = {m: _month_signature(minute_path, code, m, limit_price) for m in months}
+    todo_months = [m for m in months if cache['months'].get(m) != signatures[m]]
+    stale = set(cache['months']) - set(months)
+    if not todo_months and not stale:
+        return cache['features']
+
+    features = cache['features']
+    if len(features):
+        # 去掉需要重算或已删除的月份
+        features = features[~features.index.strftime('%Y%m').isin(set(todo_months) | stale)]
+    parts = [features] if len(features) else []
+    for month in todo_months:
+        bars = pd.read_pickle(minute_chunk_path(minute_path, code, month))
+        parts.append(calc_limit_features(bars, limit_price))
+    features = pd.concat(parts).sort_index() if parts else cache['features']
+    features = features[~features.index.duplicated(keep='last')]
+    pd.to_pickle({'months': signatures, 'features': features}, feature_path)
+    return features
+
+
+def add_minute_features(df: pd.DataFrame, code: str, minute_path: str, limit_pct: float = 0.1) -> pd.DataFrame:
+    """
+    将分钟特征回写为日线列；无分钟数据的股票/日期为 NaN
+    """
+    if not minute_path or not os.path.isdir(os.path.join(minute_path, code)):
+        for col in MINUTE_FEATURE_COLUMNS:
+            df[col] = np.nan
+        return df
+    features = build_minute_features(minute_path, code, df, limit_pct)
+    df = df.drop(columns=[c for c in MINUTE_FEATURE_COLUMNS if c in df.columns])
+    return df.merge(features, how='left', left_on='日期', right_index=True)
+
+
+def minute_feature_record(df: pd.DataFrame, idx, prefix: str = '') -> dict:
+    """
+    取某一行的分钟特征，用于写入回测记录
+    """
+    return {f"{prefix}{col}": df.at[idx, col] for col in MINUTE_FEATURE_COLUMNS if col in df.columns}
@@ -0,0 +1,139 @@
+# 多日形态方法
+# 用声明式的形态描述（逐日条件 + 买入价 + 卖出价）代替逐行循环，
+# 编译成整列的平移和比较，同一列同一偏移的平移结果在多个条件之间共用
+
+import pandas as pd
+from tqdm import tqdm
+from loader import iter_stock_files, safe_read_csv
+from security_master import load_security_master, universe_files, limit_pct_series, DEFAULT_UNIVERSE
+from minute_data import add_minute_features, MINUTE_FEATURE_COLUMNS
+
+# 形态描述示例（第0天为买入日，负数为之前的交易日，正数为之后的交易日）：
+# {
+#     'when': [(-2, '是否涨停', True), (-1, '涨幅', (-0.10, -0.05)), (0, '触及涨停', True)],
+#     'entry': (0, '最高'),                                  # 买入价
+#     'exits': {'第2天开盘收益': (1, '开盘')},                  # 卖出价，收益 = 卖出价 / 买入价 - 1
+#     'fields': {'日期': (-1, '日期')},                       # 额外写入记录的列
+#     'horizon': 3,                                          # 买入日之后至少还要有几天数据
+#     'minute': (0, ''),                                     # 分钟特征取哪天、列名前缀（可选）
+#     'date_field': '日期',                                   # 按哪个字段过滤回测区间
+# }
+# 条件的取值：True/False 判断布尔列；(下限, 上限) 闭区间，None 表示不限；也可以是函数 f(列) -> 布尔列
+
+
+def add_limit_flags(df: pd.DataFrame, by: str = None) -> pd.DataFrame:
+    """
+    按每日 涨停幅度 补上常用的涨停/炸板标记（df 需已按日期排序）
+    :param by: 多只股票堆在一张表时的代码列，前收和连板数按该列分组计算
+    """
+    df['前收'] = df.groupby(by)['收盘'].shift(1) if by else df['收盘'].shift(1)
+    df['涨幅'] = df['收盘'] / df['前收'] - 1
+    df['最高涨幅'] = df['最高'] / df['前收'] - 1
+    df['是否涨停'] = (df['涨幅'] >= df['涨停幅度'] - 0.005) & (df['涨幅'] <= df['涨停幅度'] + 0.005)
+    df['摸板'] = df['最高涨幅'] >= df['涨停幅度'] - 0.001
+    # 炸板：盘中摸到涨停但收盘未封住
+    df['是否炸板'] = df['摸板'] & (df['涨幅'] < df['涨停幅度'] - 0.001) & (df['最高涨幅'] <= df['涨停幅度'] + 0.005)
+    # 触及涨停：收盘价或最高价按两位小数达到涨停价
+    limit_price = (df['前收'] * (1 + df['涨停幅度'] - 0.005)).round(2)
+    df['触及涨停'] = (df['收盘'].round(2) >= limit_price) | (df['最高'].round(2) >= limit_price)
+    # 连续涨停计数
+    run_id = (~df['是否涨停']).cumsum()
+    df['涨停连板数'] = df['是否涨停'].groupby([df[by], run_id] if by else run_id).cumsum()
+    return df
+
+
+def _predicate(values: pd.Series, rule) -> pd.Series:
+    if callable(rule):
+        return pd.Series(rule(values), index=values.index).fillna(False).astype(bool)
+    if isinstance(rule, tuple):
+        low, high = rule
+        mask = values.notna()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask.fillna(False).astype(bool)
+    return values.eq(rule).fillna(False).astype(bool)
+
+
+def compile_pattern(pattern: dict):
+    """
+    把形态描述编译成函数 scan(df, code) -> 事件记录 DataFrame
+    """
+    when = pattern.get('when', [])
+    entry_offset, entry_col = pattern['entry']
+    exits = pattern.get('exits', {})
+    fields = pattern.get('fields', {})
+    horizon = pattern.get('horizon', max([offset for offset, _ in exits.values()] + [0]))
+    minute = pattern.get('minute')
+
+    def scan(df: pd.DataFrame, code: str, with_minute: bool = False) -> pd.DataFrame:
+        cache = {}
+
+        def shifted(col, offset):
+            # 第 i 行取第 i+offset 天的值，同一 (列, 偏移) 只平移一次
+            key = (col, offset)
+            if key not in cache:
+                cache[key] = df[col].shift(-offset) if offset else df[col]
+            return cache[key]
+
+        mask = pd.Series(True, index=df.index)
+        if horizon:
+            mask.iloc[max(len(df) - horizon, 0):] = False
+        for offset, col, rule in when:
+            mask &= _predicate(shifted(col, offset), rule)
+        if not mask.any():
+            return pd.DataFrame()
+
+        events = pd.DataFrame({'股票代码': code}, index=df.index[mask])
+        for name, (offset, col) in fields.items():
+            events[name] = shifted(col, offset)[mask]
+        if with_minute and minute:
+            offset, prefix = minute
+            for col in MINUTE_FEATURE_COLUMNS:
+                if col in df.columns:
+                    events[f"{prefix}{col}"] = shifted(col, offset)[mask]
+        buy_price = shifted(entry_col, entry_offset)[mask]
+        buy_price = buy_price.where(buy_price != 0)
+        for name, (offset, col) in exits.items():
+            events[name] = shifted(col, offset)[mask] / buy_price - 1
+        return events.reset_index(drop=True)
+
+    return scan
+
+
+def run_pattern(file_path, pattern: dict, start_date_filter, end_date_filter, minute_path=None, universe=None) -> pd.DataFrame:
+    """
+    在股票池上扫描形态，返回回测区间内的全部事件记录
+    """
+    scan = compile_pattern(pattern)
+    date_field = pattern.get('date_field', '日期')
+
+    # ✅ 按证券主表筛选股票池（默认只要主板），池外文件不读取
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, start=start_date_filter, end=end_date_filter,
+                           **(universe or DEFAULT_UNIVERSE))
+    files = list(codes)
+
+    all_events = []
+    for file, df in tqdm(iter_stock_files(file_path, files, safe_read_csv), total=len(files), desc="读取文件"):
+        try:
+            code = codes[file]
+            if df is None or df.empty:
+                continue
+
+            df.sort_values('日期', inplace=True)
+            df.reset_index(drop=True, inplace=True)
+            df['涨停幅度'] = limit_pct_series(master, code, df['日期'])
+            if minute_path:
+                df = add_minute_features(df, code, minute_path)
+            events = scan(add_limit_flags(df), code, with_minute=bool(minute_path))
+            if not events.empty:
+                all_events.append(events)
+        except Exception as e:
+            print(f"读取文件 {file} 出错：{e}")
+
+    if not all_events:
+        return pd.DataFrame()
+    df_all = pd.concat(all_events, ignore_index=True)
+    return df_all[(df_all[date_field] >= start_date_filter) & (df_all[date_field] <= end_date_filter)].copy()
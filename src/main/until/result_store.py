@@ -0,0 +1,132 @@
+# 回测结果存储方法
+# 每次运行的逐条事件记录（df_all）按固定字段写成列式文件（parquet）并附带运行信息，
+# 之后重新分组、换 TopN、换抽样都直接查文件，无需重新扫描全部股票
+
+import os
+import json
+from datetime import datetime
+import pandas as pd
+
+# 默认保存目录：mainData/results/[模型名]/[run_id].parquet
+DEFAULT_RESULT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'mainData', 'results')
+)
+
+
+def _model_dir(model: str, result_dir: str = None) -> str:
+    return os.path.join(result_dir or DEFAULT_RESULT_DIR, model)
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    按 schema 固定字段顺序与类型，缺的列补空，多的列丢弃
+    :param schema: {列名: dtype}
+    """
+    df = df.reindex(columns=list(schema))
+    for col, dtype in schema.items():
+        if dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(df[col])
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def save_event_records(df_all: pd.DataFrame, model: str, schema: dict, params: dict = None, result_dir: str = None):
+    """
+    保存一次运行的事件记录
+    :param df_all: 逐条事件记录
+    :param model: 模型名，如 'model7'
+    :param schema: 字段及类型
+    :param params: 运行参数（回测区间、股票池等），写入运行信息
+    :return: run_id，保存失败返回 None
+    """
+    # 精确到微秒，同一秒内多次运行也不会互相覆盖；按文件名排序即按时间排序
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    model_dir = _model_dir(model, result_dir)
+    try:
+        os.makedirs(model_dir, exist_ok=True)
+        apply_schema(df_all, schema).to_parquet(os.path.join(model_dir, f"{run_id}.parquet"), index=False)
+        meta = {
+            'model': model,
+            'run_id': run_id,
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'rows': int(len(df_all)),
+            'schema': schema,
+            'params': {k: str(v) for k, v in (params or {}).items()},
+        }
+        with open(os.path.join(model_dir, f"{run_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"❌ 保存事件记录失败：{e}")
+        return None
+    print(f"💾 事件记录已保存：{model}/{run_id}（{len(df_all)}条）")
+    return run_id
+
+
+def list_runs(model: str, result_dir: str = None) -> pd.DataFrame:
+    """
+    列出某个模型的历史运行（按时间升序）
+    """
+    model_dir = _model_dir(model, result_dir)
+    if not os.path.isdir(model_dir):
+        return pd.DataFrame(columns=['run_id', 'created', 'rows', 'params'])
+    metas = []
+    for file in sorted(os.listdir(model_dir)):
+        if file.endswith('.json'):
+            with open(os.path.join(model_dir, file), 'r', encoding='utf-8') as f:
+                metas.append(json.load(f))
+    return pd.DataFrame(metas, columns=['run_id', 'created', 'rows', 'params'])
+
+
+def load_run_meta(model: str, run_id: str = None, result_dir: str = None) -> dict:
+    """
+    读取运行信息，run_id 为空时取最近一次
+    """
+    run_id = run_id or _latest_run_id(model, result_dir)
+    with open(os.path.join(_model_dir(model, result_dir), f"{run_id}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _latest_run_id(model, result_dir):
+    runs = list_runs(model, result_dir)
+    if runs.empty:
+        raise FileNotFoundError(f"没有 {model} 的事件记录，请先运行一次模型")
+    return runs['run_id'].iloc[-1]
+
+
+def load_event_records(model: str, run_id: str = None, columns: list = None, filters: list = None,
+                       result_dir: str = None) -> pd.DataFrame:
+    """
+    读取事件记录，run_id 为空时取最近一次
+    :param columns: 只读取这些列
+    :param filters: parquet 过滤条件，如 [('板数', '==', '1板'), ('日期', '>=', pd.Timestamp('2025-01-01'))]
+    """
+    run_id = run_id or _latest_run_id(model, result_dir)
+    path = os.path.join(_model_dir(model, result_dir), f"{run_id}.parquet")
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def summarize_events(df: pd.DataFrame, by, values: list) -> pd.DataFrame:
+    """
+    按 by 分组重新汇总：条数、各收益列平均收益和胜率
+    """
+    grouped = df.groupby(by, observed=False)
+    result = pd.DataFrame({'条数': grouped.size()})
+    for col in values:
+        result[f"{col}平均收益"] = grouped[col].mean()
+        result[f"{col}胜率"] = grouped[col].apply(lambda s: (s > 0).mean())
+    return result
+
+
+def top_events(df: pd.DataFrame, col: str, n: int = 20, ascending: bool = False) -> pd.DataFrame:
+    """
+    按某列取前 N 条记录
+    """
+    return df.sort_values(col, ascending=ascending).head(n)
+
+
+def sample_events(df: pd.DataFrame, n: int = 10, random_state: int = 42) -> pd.DataFrame:
+    """
+    随机抽取记录供验证
+    """
+    return df.sample(n=min(n, len(df)), random_state=random_state)
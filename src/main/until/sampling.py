@@ -0,0 +1,258 @@
+# 抽样估算方法
+# 按 板块 × 流动性 分层随机抽取部分股票跑回测，用分层比率估计给出各组平均收益、胜率及置信区间，
+# 抽样比例逐轮翻倍，直到误差达标或抽满全部股票（此时结果与全量回测一致）
+
+import os
+import math
+import pickle
+import numpy as np
+import pandas as pd
+from loader import guess_encoding
+from security_master import load_security_master, universe_files, DEFAULT_UNIVERSE
+
+# 流动性分档数（按近期平均成交额等分）
+LIQUIDITY_BINS = 3
+LIQUIDITY_LABELS = ['低流动性', '中流动性', '高流动性']
+# 近期平均成交额取文件末尾多少行
+LIQUIDITY_ROWS = 20
+# 平均成交额缓存：数据目录上一级的 liquidity_cache.pkl，{文件路径: ((修改时间, 大小), 平均成交额)}
+LIQUIDITY_FILE = 'liquidity_cache.pkl'
+# 95% 置信区间：t 分布 0.975 分位数（自由度 1~30），更大自由度按正态 1.96
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_95 = 1.96
+# 至少有几只抽中的股票贡献事件才给出误差
+MIN_EVENT_STOCKS = 3
+# 只给误差目标时的起始抽样比例
+DEFAULT_SAMPLE_FRAC = 0.05
+
+
+def _tail_amount(path: str, rows: int = LIQUIDITY_ROWS) -> float:
+    """
+    只读文件末尾，取最近 rows 行的平均成交额
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 200 * (rows + 1), 0))
+        tail = f.read()
+    enc = guess_encoding(header)
+    columns = header.decode(enc, errors='ignore').strip().lstrip('\ufeff').split(',')
+    lines = [line for line in tail.decode(enc, errors='ignore').splitlines() if line.strip()]
+    if '成交额' not in columns:
+        return np.nan
+    pos = columns.index('成交额')
+    values = pd.to_numeric(pd.Series([line.split(',')[pos] if line.count(',') >= pos else None
+                                      for line in lines[1:][-rows:]]), errors='coerce')
+    return values.mean()
+
+
+def default_liquidity_path(file_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), LIQUIDITY_FILE)
+
+
+def load_liquidity(file_path: str, files: list, cache_path: str = None) -> dict:
+    """
+    各文件的近期平均成交额；按文件修改时间和大小缓存，只重读有变化（如追加了新日线）的文件
+    :return: {文件名: 平均成交额}
+    """
+    cache_path = cache_path or default_liquidity_path(file_path)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    result, changed = {}, False
+    for file in files:
+        path = os.path.abspath(os.path.join(file_path, file))
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if path not in cache or cache[path][0] != key:
+            cache[path] = (key, _tail_amount(path))
+            changed = True
+        result[file] = cache[path][1]
+    if changed:
+        with open(cache_path, 'wb') as f:
+            pickle.dump(cache, f)
+    return result
+
+
+def stratify(file_path: str, master: pd.DataFrame, codes: dict, liquidity_bins: int = LIQUIDITY_BINS) -> pd.DataFrame:
+    """
+    按 板块 × 流动性 给股票池分层
+    :param codes: universe_files 的结果 {文件名: 代码}
+    :return: index 为代码，列为 文件/板块/平均成交额/层
+    """
+    strata = pd.DataFrame({'文件': list(codes)}, index=pd.Index(list(codes.values()), name='代码'))
+    strata['板块'] = master['板块'].reindex(strata.index).fillna('未知').values
+    liquidity = load_liquidity(file_path, list(codes))
+    strata['平均成交额'] = [liquidity[file] for file in strata['文件']]
+    labels = LIQUIDITY_LABELS if liquidity_bins == len(LIQUIDITY_LABELS) else list(range(liquidity_bins))
+    ranks = strata['平均成交额'].rank(method='first')
+    liquidity = pd.qcut(ranks, liquidity_bins, labels=labels) if ranks.notna().sum() >= liquidity_bins \
+        else pd.Series(np.nan, index=strata.index)
+    strata['层'] = strata['板块'] + '/' + liquidity.astype(object).fillna('未知').astype(str)
+    return strata
+
+
+def sample_rounds(strata: pd.DataFrame, sample_frac: float, random_state: int = 42):
+    """
+    逐轮扩大抽样：每轮抽样比例翻倍，只返回本轮新增的代码，最后一轮抽满
+    每层至少抽 2 只（不足 2 只的层全抽），以便估计层内方差；没有新增代码的轮次跳过
+    """
+    rng = np.random.default_rng(random_state)
+    order = {layer: rng.permutation(group.index.to_numpy()) for layer, group in strata.groupby('层')}
+    taken = {layer: 0 for layer in order}
+    frac = sample_frac
+    while True:
+        frac = min(frac, 1.0)
+        new_codes = []
+        for layer, layer_codes in order.items():
+            size = len(layer_codes)
+            target = size if frac >= 1 else min(size, max(2, math.ceil(frac * size)))
+            new_codes.extend(layer_codes[taken[layer]:target])
+            taken[layer] = max(taken[layer], target)
+        if new_codes:
+            yield frac, new_codes
+        if frac >= 1:
+            return
+        frac *= 2
+
+
+def _critical_value(dof: int) -> float:
+    return T_95[dof - 1] if dof <= len(T_95) else Z_95
+
+
+def _layer_variance(values: pd.Series, layers: pd.Series, pop_sizes: pd.Series, sample_sizes: pd.Series) -> float:
+    """
+    分层抽样总量估计的方差：Σ N_h² (1 - n_h/N_h) s_h² / n_h
+    """
+    total = 0.0
+    for layer, group in values.groupby(layers):
+        N, n = pop_sizes[layer], sample_sizes[layer]
+        if n >= N:
+            continue
+        if n < 2:
+            return np.nan
+        total += N ** 2 * (1 - n / N) * group.var(ddof=1) / n
+    return total
+
+
+def _ratio_estimate(y: pd.Series, x: pd.Series, layers, weights, pop_sizes, sample_sizes, z):
+    """
+    比率估计 R = Σwy / Σwx 及置信区间半宽（线性化方差）
+    """
+    x_total = (weights * x).sum()
+    if x_total == 0:
+        return np.nan, np.nan
+    ratio = (weights * y).sum() / x_total
+    residual = (y - ratio * x) / x_total
+    variance = _layer_variance(residual, layers, pop_sizes, sample_sizes)
+    return ratio, z * math.sqrt(variance) if pd.notna(variance) else np.nan
+
+
+def estimate_groups(df_all: pd.DataFrame, strata: pd.DataFrame, sampled: list, by, values: list) -> pd.DataFrame:
+    """
+    用抽中的股票估算全股票池的分组统计
+    :param df_all: 抽中股票的事件记录（需有 股票代码 列）
+    :param sampled: 抽中的代码（没有事件的股票也要算在内）
+    :param by: 分组列，None 表示不分组
+    :return: 每组 条数/平均收益/胜率 的估计值及 ± 误差（95% 置信区间半宽）
+    """
+    layers = strata.loc[sampled, '层']
+    pop_sizes = strata['层'].value_counts()
+    sample_sizes = layers.value_counts()
+    weights = (pop_sizes / sample_sizes).reindex(layers.values).set_axis(layers.index)
+
+    if df_all.empty:
+        groups = []
+    else:
+        groups = df_all.groupby(by, observed=True) if by else [('全部', df_all)]
+    rows = {}
+    for name, part in groups:
+        per_stock = part.groupby('股票代码')
+        count = per_stock.size().reindex(layers.index, fill_value=0)
+        # 同一只股票的事件相关，自由度按有事件的股票数计，少数股票贡献事件时区间相应放宽
+        z = _critical_value(max(int((count > 0).sum()) - 1, 1))
+        row = {'条数': (weights * count).sum()}
+        variance = _layer_variance(count, layers, pop_sizes, sample_sizes)
+        row['条数误差'] = z * math.sqrt(variance) if pd.notna(variance) else np.nan
+        for col in values:
+            valid = part[col].notna()
+            # 平均收益只算有值的记录，胜率与 summarize_events 一致按全部记录计算
+            n_valid = valid.groupby(part['股票代码']).sum().reindex(layers.index, fill_value=0)
+            total = part[col].where(valid, 0).groupby(part['股票代码']).sum().reindex(layers.index, fill_value=0)
+            wins = (part[col] > 0).groupby(part['股票代码']).sum().reindex(layers.index, fill_value=0)
+            args = (layers, weights, pop_sizes, sample_sizes, z)
+            row[f"{col}平均收益"], row[f"{col}平均收益误差"] = _ratio_estimate(total, n_valid, *args)
+            row[f"{col}胜率"], row[f"{col}胜率误差"] = _ratio_estimate(wins, count, *args)
+        if (count > 0).sum() < MIN_EVENT_STOCKS and len(layers) < len(strata):
+            # 事件只来自极少几只抽中的股票时方差估计不可靠，不给误差
+            row = {k: np.nan if k.endswith('误差') else v for k, v in row.items()}
+        rows[name] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def _format_value(v, e, is_rate: bool) -> str:
+    if pd.isna(v):
+        return "NaN"
+    if pd.isna(e):
+        return f"{v:.2%}"
+    if is_rate and (v - e < 0 or v + e > 1):
+        return f"{v:.2%}（{max(v - e, 0):.2%} ~ {min(v + e, 1):.2%}）"
+    return f"{v:.2%} ± {e:.2%}"
+
+
+def format_estimates(result: pd.DataFrame) -> pd.DataFrame:
+    """
+    把估计值和误差合并成 "1.23% ± 0.45%" 的形式便于打印
+    胜率的区间截断到 [0, 100%]，截断后不对称，写成 "41.18%（0.00% ~ 100.00%）"
+    """
+    table = pd.DataFrame(index=result.index)
+    table['条数'] = [f"{v:.0f} ± {e:.0f}" if pd.notna(e) else f"{v:.0f}（样本不足）"
+                   for v, e in zip(result['条数'], result['条数误差'])]
+    for col in result.columns:
+        if col.endswith('误差') or col.startswith('条数'):
+            continue
+        table[col] = [_format_value(v, e, col.endswith('胜率')) for v, e in zip(result[col], result[f"{col}误差"])]
+    return table
+
+
+def max_error(result: pd.DataFrame) -> float:
+    """
+    各组平均收益的最大误差，有组无法估计误差时为 inf
+    """
+    errors = result[[c for c in result.columns if c.endswith('平均收益误差')]].to_numpy(dtype=float)
+    return np.inf if not errors.size or np.isnan(errors).any() else float(errors.max())
+
+
+def run_approximate(collect, file_path, start_date_filter, end_date_filter, by, values: list, universe=None,
+                    sample_frac=None, target_error=None, random_state: int = 42) -> pd.DataFrame:
+    """
+    抽样估算模式
+    :param collect: collect(universe) -> 事件记录，模型按股票池收集事件的函数
+    :param by/values: 分组列与收益列，与模型的汇总口径一致
+    :param sample_frac: 抽样比例；只给此项时只跑一轮
+    :param target_error: 平均收益误差目标（如 0.005 即 ±0.5%）；抽样比例逐轮翻倍直到达标，0 表示一直细化到全量
+    :return: 最后一轮的估计结果
+    """
+    universe = universe or DEFAULT_UNIVERSE
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, start=start_date_filter, end=end_date_filter, **universe)
+    strata = stratify(file_path, master, codes)
+    print(f"\n🎲 抽样估算：股票池 {len(strata)} 只，分 {strata['层'].nunique()} 层")
+
+    sampled, parts, result = [], [], pd.DataFrame()
+    for frac, new_codes in sample_rounds(strata, sample_frac or DEFAULT_SAMPLE_FRAC, random_state):
+        events = collect({**universe, 'codes': new_codes})
+        if events is not None and not events.empty:
+            parts.append(events)
+        sampled.extend(new_codes)
+        df_all = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['股票代码'] + values)
+        result = estimate_groups(df_all, strata, sampled, by, values)
+
+        print(f"\n📊 抽样 {len(sampled)}/{len(strata)} 只（{len(sampled) / len(strata):.1%}），估计值 ± 95%置信区间：")
+        print(format_estimates(result).to_string() if not result.empty else "❌ 样本内没有事件")
+        if target_error is None or max_error(result) <= target_error:
+            break
+    return result
@@ -0,0 +1,286 @@
+# 收盘选股方法
+# 每天收盘后把最新一根日线追加到数据文件，只用每只股票最近几天的滚动窗口判断各模型今天是否触发，
+# 所有股票的窗口堆在一张表里（按 代码 分组），整表一次算完涨停/炸板标记和各模型条件，
+# 窗口和连板数等状态保存在 screener_state.pkl 中，第二天接着用
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from loader import iter_stock_files, safe_read_csv, guess_encoding
+from security_master import load_security_master, universe_files, select_universe, limit_pct_series, \
+    limit_pct_panel, DEFAULT_UNIVERSE
+from pattern import add_limit_flags
+
+# 默认状态文件：mainData/screener_state.pkl
+DEFAULT_STATE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'mainData', 'screener_state.pkl')
+)
+
+# 每只股票保留的交易日数：model3 需要 4 个收盘价，model6/7 需要 3 天 + 前收
+WINDOW = 5
+
+BAR_COLUMNS = ['日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额']
+PANEL_COLUMNS = ['代码'] + BAR_COLUMNS + ['连板数']
+
+
+def _file_info(path):
+    """
+    打开一次文件，取编码、表头和最后一行的日期，供判断窗口衔接和追加写入共用
+    :return: {'encoding', 'header', 'last_date'}，文件不存在返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 4096, 0))
+        tail = f.read()
+    enc = guess_encoding(head)
+    lines = head.decode(enc, errors='ignore').splitlines()
+    header = lines[0].strip().lstrip('\ufeff').split(',') if lines else []
+    lines = [line for line in tail.decode(enc, errors='ignore').splitlines() if line.strip()]
+    last_date = None
+    if len(lines) > 1 and '日期' in header:
+        values = lines[-1].split(',')
+        pos = header.index('日期')
+        last_date = pd.to_datetime(values[pos], errors='coerce') if pos < len(values) else None
+        last_date = last_date if pd.notna(last_date) else None
+    return {'encoding': enc, 'header': header, 'last_date': last_date}
+
+
+def stock_files(file_path: str) -> dict:
+    """
+    数据目录里每只股票对应的文件名（与 universe_files 一样按文件名前6位取代码）
+    :return: {代码: 文件名}
+    """
+    return {os.path.splitext(file)[0][:6]: file for file in sorted(os.listdir(file_path)) if file.endswith('.csv')}
+
+
+# ==== 各模型今天是否触发（t 每行是一只股票的今天，列名 列_n 表示 n 个交易日前的值） ====
+
+def screen_model3(t):
+    drop = t['收盘'] / t['收盘_3'] - 1
+    hit = (t['窗口天数'] >= 4) & (drop <= -0.20)
+    return pd.DataFrame({'3日跌幅': drop, '操作': '明日开盘买入'})[hit]
+
+
+def screen_model4(t):
+    hit = (t['窗口天数'] >= 3) & t['是否炸板_1'] & (t['最高涨幅'] >= t['涨停幅度'] - 0.001)
+    return pd.DataFrame({'炸板日期': t['日期_1'], '买入价': t['最高'], '操作': '今日涨停价买入'})[hit]
+
+
+def screen_model5(t):
+    hit = t['是否涨停'] & t['连板数'].between(1, 5)
+    return pd.DataFrame({'买入板数': t['连板数'].astype(int), '操作': '明日开盘买入'})[hit]
+
+
+def screen_model6(t):
+    hit = (t['窗口天数'] >= 4) & t['是否涨停_2'] & ~t['是否涨停_1'] & t['触及涨停']
+    return pd.DataFrame({'第2日收盘涨幅': t['涨幅_1'], '买入价': t['最高'], '操作': '今日涨停价买入'})[hit]
+
+
+def screen_model7(t):
+    hit = (t['窗口天数'] >= 4) & t['是否涨停_2'] & t['涨幅_1'].between(-0.10, -0.05) & t['触及涨停']
+    连板数 = t['连板数_2'].fillna(0).astype(int)
+    板数 = (连板数.astype(str) + '板').where(连板数.between(1, 5), '其他')
+    return pd.DataFrame({'板数': 板数, '买入价': t['最高'], '操作': '今日涨停价买入'})[hit]
+
+
+SCREENERS = {
+    'model3': screen_model3,
+    'model4': screen_model4,
+    'model5': screen_model5,
+    'model6': screen_model6,
+    'model7': screen_model7,
+}
+
+# 各模型用到的前几个交易日的列：{列名: 最多往前几天}
+LAG_COLUMNS = {'收盘': 3, '日期': 1, '是否炸板': 1, '是否涨停': 2, '涨幅': 1, '连板数': 2}
+
+
+def _empty_panel() -> pd.DataFrame:
+    return pd.DataFrame(columns=PANEL_COLUMNS)
+
+
+def load_screener_state(state_path: str = None) -> dict:
+    """
+    状态格式：{'universe': 股票池, 'last_date': 上次选股日, 'panel': 各股票窗口堆成的一张表（列为 PANEL_COLUMNS）}
+    """
+    state_path = state_path or DEFAULT_STATE_PATH
+    if not os.path.exists(state_path):
+        return {'universe': None, 'last_date': None, 'panel': _empty_panel()}
+    with open(state_path, 'rb') as f:
+        state = pickle.load(f)
+    if 'panel' not in state:
+        # 旧格式：{代码: 滚动窗口}，或 {'universe', 'last_date', 'stocks': {代码: 滚动窗口}}
+        stocks = state['stocks'] if 'stocks' in state else state
+        wins = [win.assign(代码=code) for code, win in stocks.items() if len(win)]
+        panel = pd.concat(wins, ignore_index=True)[PANEL_COLUMNS] if wins else _empty_panel()
+        state = {'universe': state.get('universe') if 'stocks' in state else None,
+                 'last_date': panel['日期'].max() if len(panel) else None,
+                 'panel': panel}
+    return state
+
+
+def save_screener_state(state: dict, state_path: str = None):
+    state_path = state_path or DEFAULT_STATE_PATH
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, 'wb') as f:
+        pickle.dump(state, f)
+
+
+def _init_stock_state(df: pd.DataFrame, master, code) -> pd.DataFrame:
+    df = df.sort_values('日期').reset_index(drop=True)
+    df['涨停幅度'] = limit_pct_series(master, code, df['日期']).values
+    df['连板数'] = add_limit_flags(df.copy())['涨停连板数'].values
+    df['代码'] = code
+    return df[[c for c in PANEL_COLUMNS if c in df.columns]].tail(WINDOW).reset_index(drop=True)
+
+
+def init_screener_state(file_path: str, state_path: str = None, universe: dict = None) -> dict:
+    """
+    用历史数据初始化每只股票的滚动窗口（只需运行一次）
+    :param universe: 股票池筛选条件（见 select_universe），随状态保存，之后 run_screener 默认沿用
+    """
+    universe = universe or DEFAULT_UNIVERSE
+    master = load_security_master(file_path=file_path)
+    codes = universe_files(file_path, master, **universe)
+    files = list(codes)
+    wins = []
+    for file, df in tqdm(iter_stock_files(file_path, files, safe_read_csv), total=len(files), desc="初始化选股状态"):
+        if df is None or df.empty:
+            continue
+        wins.append(_init_stock_state(df, master, codes[file]))
+    panel = pd.concat(wins, ignore_index=True) if wins else _empty_panel()
+    state = {'universe': universe, 'last_date': panel['日期'].max() if len(panel) else None, 'panel': panel}
+    save_screener_state(state, state_path)
+    return state
+
+
+def append_latest_bars(file_path: str, bars: pd.DataFrame, files: dict = None, infos: dict = None):
+    """
+    把当天日线追加到每只股票的数据文件末尾（按原文件编码和列顺序），已有的日期不重复写入
+    :param bars: 当天日线，列为 股票代码 + BAR_COLUMNS
+    :param files: {代码: 文件名}，默认按 stock_files 扫描数据目录；没有文件的股票新建 代码.csv
+    :param infos: {代码: _file_info 的结果}，调用方已读过的文件不再重复打开
+    """
+    files = files if files is not None else stock_files(file_path)
+    infos = infos if infos is not None else {}
+    for bar in bars.to_dict('records'):
+        code = str(bar['股票代码']).zfill(6)
+        path = os.path.join(file_path, files.get(code, f"{code}.csv"))
+        info = infos[code] if code in infos else _file_info(path)
+        if info is None:
+            pd.DataFrame([{c: bar[c] for c in BAR_COLUMNS if c in bar}]) \
+              .to_csv(path, index=False, encoding='utf-8', date_format='%Y-%m-%d')
+            files[code] = os.path.basename(path)
+            continue
+        date = pd.to_datetime(bar['日期'])
+        if info['last_date'] is not None and date <= info['last_date']:
+            continue
+        row = {**bar, '日期': date.strftime('%Y-%m-%d')}
+        line = ','.join('' if c not in row or pd.isna(row[c]) else str(row[c]) for c in info['header'])
+        with open(path, 'a', encoding=info['encoding']) as f:
+            f.write(line + '\n')
+
+
+def _rebuild_windows(file_path: str, files: dict, master, dates: dict) -> pd.DataFrame:
+    """
+    按数据文件重建部分股票的窗口，只用各自今天之前的交易日
+    :param dates: {代码: 今天的日期}
+    """
+    paths = {files[code]: code for code in dates if code in files}
+    wins = []
+    for file, df in iter_stock_files(file_path, list(paths), safe_read_csv):
+        code = paths[file]
+        df = df[df['日期'] < dates[code]] if df is not None else None
+        if df is not None and not df.empty:
+            wins.append(_init_stock_state(df, master, code))
+    return pd.concat(wins, ignore_index=True) if wins else _empty_panel()
+
+
+def run_screener(bars: pd.DataFrame, file_path: str, state_path: str = None, models: list = None,
+                 append: bool = True, universe: dict = None) -> dict:
+    """
+    收盘选股：更新滚动窗口并输出今天触发的信号
+    :param bars: 当天日线，列为 股票代码 + BAR_COLUMNS
+    :param models: 要判断的模型，默认全部
+    :param append: 是否同时把当天日线写入数据文件
+    :param universe: 股票池筛选条件（见 select_universe），默认沿用状态里保存的股票池，池外股票不参与选股
+    :return: {模型名: 触发的股票 DataFrame}
+    """
+    master = load_security_master(file_path=file_path)
+    state = load_screener_state(state_path)
+    universe = universe or state['universe'] or DEFAULT_UNIVERSE
+    state['universe'] = universe
+    files = stock_files(file_path)
+    models = models or list(SCREENERS)
+
+    today_bars = bars.assign(代码=bars['股票代码'].astype(str).str.zfill(6), 日期=pd.to_datetime(bars['日期']))
+    today_bars = today_bars[today_bars['代码'].isin(set(select_universe(master, **universe)))]
+    today_bars = today_bars.drop_duplicates('代码', keep='last')
+
+    # 每个文件只打开一次：编码、表头、写入前的最后日期，窗口衔接判断和追加写入共用
+    infos = {code: _file_info(os.path.join(file_path, files[code])) for code in today_bars['代码'] if code in files}
+    if append:
+        append_latest_bars(file_path, bars, files, infos)
+
+    today = today_bars['日期'].max() if len(today_bars) else None
+    if today is not None and state['last_date'] is not None and today > state['last_date']:
+        gap = int(np.busday_count(state['last_date'].date(), today.date())) - 1
+        if gap > 0:
+            print(f"⚠️ 上次选股日 {state['last_date']:%Y-%m-%d} 与 {today:%Y-%m-%d} 之间有 {gap} 个工作日没有选股（节假日可忽略），"
+                  f"缺失的日线需先补进数据文件，补齐后相应股票的窗口会按文件重建")
+
+    panel = state['panel']
+    today_bars = today_bars.assign(窗口末日=today_bars['代码'].map(panel.groupby('代码')['日期'].max()))
+    # 今天早于窗口最后一天（补跑历史）的股票跳过
+    today_bars = today_bars[~(today_bars['日期'] < today_bars['窗口末日'])]
+    file_last = pd.to_datetime(today_bars['代码'].map(
+        lambda code: infos[code]['last_date'] if infos.get(code) else None))
+    # 没有窗口，或数据文件里有窗口之后、今天之前的交易日（中间有没跑选股的日子）：按文件重建窗口，
+    # 避免把不相邻的两天接成一个形态
+    rebuild = today_bars['窗口末日'].isna() | ((file_last < today_bars['日期']) & (file_last > today_bars['窗口末日']))
+    today_dates = dict(zip(today_bars['代码'], today_bars['日期']))
+    rebuilt = _rebuild_windows(file_path, files, master,
+                               {code: today_dates[code] for code in today_bars.loc[rebuild, '代码']})
+
+    # 同一天重复运行时覆盖当天：去掉窗口里今天及之后的行，再接上今天的日线
+    keep = ~panel['代码'].isin(today_bars.loc[rebuild, '代码']) & ~(panel['日期'] >= panel['代码'].map(today_dates))
+    new_rows = today_bars[[c for c in PANEL_COLUMNS if c in today_bars.columns]]
+    parts = [p for p in [panel[keep], rebuilt, new_rows] if len(p)]
+    panel = pd.concat(parts, ignore_index=True) if parts else _empty_panel()
+    panel = panel.sort_values(['代码', '日期'], kind='stable').groupby('代码').tail(WINDOW).reset_index(drop=True)
+    for col in ['开盘', '收盘', '最高', '最低']:
+        panel[col] = panel[col].astype(float)
+
+    # 整表一次算标记；今天的连板数 = 前一天的连板数 + 1（今天涨停）或 0
+    flags = add_limit_flags(panel.assign(涨停幅度=limit_pct_panel(master, panel['代码'], panel['日期'])), by='代码')
+    grouped = flags.groupby('代码')
+    is_today = panel['日期'] == panel['代码'].map(today_dates)
+    prev_streak = grouped['连板数'].shift(1).fillna(0).astype(int)
+    panel['连板数'] = np.where(is_today, np.where(flags['是否涨停'], prev_streak + 1, 0), panel['连板数']).astype(int)
+    flags['连板数'] = panel['连板数']
+
+    flags['窗口天数'] = grouped.cumcount() + 1
+    for col, lags in LAG_COLUMNS.items():
+        for n in range(1, lags + 1):
+            shifted = grouped[col].shift(n)
+            flags[f"{col}_{n}"] = shifted.fillna(False).astype(bool) if flags[col].dtype == bool else shifted
+    # 按当天日线的顺序输出
+    t = flags[is_today].set_index('代码', drop=False).reindex(new_rows['代码'])
+
+    hits = {}
+    for model in models:
+        found = SCREENERS[model](t)
+        found.insert(0, '股票代码', t.loc[found.index, '代码'].values)
+        found.insert(1, '日期', t.loc[found.index, '日期'].values)
+        hits[model] = found.reset_index(drop=True) if len(found) else pd.DataFrame()
+
+    state['panel'] = panel[PANEL_COLUMNS]
+    if today is not None:
+        state['last_date'] = max(today, state['last_date']) if state['last_date'] is not None else today
+    save_screener_state(state, state_path)
+    return hits
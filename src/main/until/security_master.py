@@ -0,0 +1,192 @@
+# 证券主表方法
+# 代码、板块、涨跌幅限制、上市/退市日期、ST 区间集中维护，
+# 在读文件前就按股票池筛选，板块涨跌停规则也统一从这里取
+
+import os
+import pandas as pd
+from loader import read_csv_any
+
+MASTER_COLUMNS = ['代码', '名称', '板块', '涨跌幅限制', '上市日期', '退市日期', 'ST区间']
+MASTER_FILE = 'security_master.csv'
+
+# 代码前缀 → (板块, 涨跌幅限制)，按前缀长度从长到短匹配
+BOARD_RULES = [
+    ('92', '北交所', 0.30),
+    ('60', '主板', 0.10),
+    ('00', '主板', 0.10),
+    ('30', '创业板', 0.20),
+    ('68', '科创板', 0.20),
+    ('8', '北交所', 0.30),
+    ('4', '北交所', 0.30),
+]
+
+# 主板 ST 股涨跌幅限制
+ST_LIMIT_PCT = 0.05
+
+# 各模型默认股票池：主板
+DEFAULT_UNIVERSE = {'boards': ['主板']}
+
+
+def infer_board(code: str):
+    """
+    根据代码前缀推断板块和涨跌幅限制，无法识别返回 (None, None)
+    """
+    if not code.isdigit() or len(code) != 6:
+        return None, None
+    for prefix, board, pct in BOARD_RULES:
+        if code.startswith(prefix):
+            return board, pct
+    return None, None
+
+
+def default_master_path(file_path: str) -> str:
+    """
+    默认主表位置：数据目录的上一级（mainData/security_master.csv）
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), MASTER_FILE)
+
+
+def parse_st_periods(text) -> list:
+    """
+    解析 ST区间 字段，格式：20200101-20210315;20220501-（结束为空表示至今）
+    """
+    if not isinstance(text, str) or not text.strip():
+        return []
+    periods = []
+    for part in text.split(';'):
+        start, _, end = part.strip().partition('-')
+        if not start:
+            continue
+        periods.append((pd.to_datetime(start), pd.to_datetime(end) if end else pd.Timestamp.max))
+    return periods
+
+
+def _read_dates(path):
+    try:
+        return read_csv_any(path, usecols=['日期'], parse_dates=['日期'])['日期']
+    except Exception:
+        return None
+
+
+def build_security_master(file_path: str, scan: bool = False) -> pd.DataFrame:
+    """
+    根据数据目录的文件名生成主表（板块、涨跌幅限制由代码推断）
+    :param scan: True 时读取每个文件的日期列，用首个交易日填充上市日期
+    """
+    rows = []
+    for file in sorted(os.listdir(file_path)):
+        if not file.endswith('.csv'):
+            continue
+        code = os.path.splitext(file)[0][:6]
+        board, pct = infer_board(code)
+        if board is None:
+            continue
+        row = {'代码': code, '名称': '', '板块': board, '涨跌幅限制': pct,
+               '上市日期': pd.NaT, '退市日期': pd.NaT, 'ST区间': ''}
+        if scan:
+            dates = _read_dates(os.path.join(file_path, file))
+            if dates is not None and len(dates):
+                row['上市日期'] = dates.min()
+        rows.append(row)
+    return pd.DataFrame(rows, columns=MASTER_COLUMNS)
+
+
+def save_security_master(master: pd.DataFrame, master_path: str):
+    master = master.reset_index() if master.index.name == '代码' else master
+    master[MASTER_COLUMNS].to_csv(master_path, index=False, encoding='utf-8-sig', date_format='%Y%m%d')
+
+
+def load_security_master(master_path: str = None, file_path: str = None) -> pd.DataFrame:
+    """
+    读取主表（index 为代码）；主表不存在时按 file_path 文件名生成并保存，之后可手工补充名称、ST区间等
+    """
+    master_path = master_path or default_master_path(file_path)
+    if os.path.exists(master_path):
+        master = pd.read_csv(master_path, encoding='utf-8-sig', dtype=str)
+        master['代码'] = master['代码'].str.zfill(6)
+        master['涨跌幅限制'] = master['涨跌幅限制'].astype(float)
+        for col in ['上市日期', '退市日期']:
+            master[col] = pd.to_datetime(master[col], format='%Y%m%d', errors='coerce')
+    elif file_path:
+        master = build_security_master(file_path)
+        save_security_master(master, master_path)
+    else:
+        raise FileNotFoundError(f"证券主表不存在：{master_path}")
+    return master.set_index('代码')
+
+
+def select_universe(master: pd.DataFrame, boards=None, exclude_st: bool = False, start=None, end=None, codes=None) -> list:
+    """
+    股票池筛选
+    :param boards: 板块列表，如 ['主板']，None 表示全部
+    :param exclude_st: 排除与 [start, end] 有交集的 ST 股票
+    :param start/end: 回测区间，排除区间内未上市或已退市的股票
+    :param codes: 限定代码范围
+    :return: 代码列表
+    """
+    mask = pd.Series(True, index=master.index)
+    if boards is not None:
+        mask &= master['板块'].isin(boards)
+    if codes is not None:
+        mask &= master.index.isin(list(codes))
+    if end is not None:
+        mask &= ~(master['上市日期'] > pd.to_datetime(end))
+    if start is not None:
+        mask &= ~(master['退市日期'] < pd.to_datetime(start))
+    if exclude_st:
+        lo = pd.to_datetime(start) if start is not None else pd.Timestamp.min
+        hi = pd.to_datetime(end) if end is not None else pd.Timestamp.max
+        in_st = master['ST区间'].apply(lambda t: any(s <= hi and e >= lo for s, e in parse_st_periods(t)))
+        mask &= ~in_st
+    return master.index[mask].tolist()
+
+
+def universe_files(file_path: str, master: pd.DataFrame, **selector) -> dict:
+    """
+    只返回股票池内的文件，池外文件不会被打开
+    :param selector: 透传给 select_universe 的筛选条件
+    :return: {文件名: 代码}
+    """
+    universe = set(select_universe(master, **selector))
+    files = {}
+    for file in os.listdir(file_path):
+        if not file.endswith('.csv'):
+            continue
+        code = os.path.splitext(file)[0][:6]
+        if code in universe:
+            files[file] = code
+    return files
+
+
+def limit_pct_series(master: pd.DataFrame, code: str, dates: pd.Series) -> pd.Series:
+    """
+    每个交易日的涨跌幅限制（主板 ST 期间为 5%）
+    """
+    if code in master.index:
+        row = master.loc[code]
+        board, pct, st_text = row['板块'], float(row['涨跌幅限制']), row['ST区间']
+    else:
+        board, pct = infer_board(code)
+        pct = pct if pct is not None else 0.10
+        st_text = ''
+    result = pd.Series(pct, index=dates.index)
+    if board == '主板':
+        for start, end in parse_st_periods(st_text):
+            result[(dates >= start) & (dates <= end)] = ST_LIMIT_PCT
+    return result
+
+
+def limit_pct_panel(master: pd.DataFrame, codes: pd.Series, dates: pd.Series) -> pd.Series:
+    """
+    多只股票堆在一张表时逐行的涨跌幅限制，口径与 limit_pct_series 一致
+    :param codes/dates: 同一索引的代码列和日期列
+    """
+    pct = codes.map(master['涨跌幅限制'])
+    for code in codes[pct.isna()].unique():
+        pct[codes == code] = infer_board(code)[1] or 0.10
+    st_text = master.loc[master['板块'] == '主板', 'ST区间'].dropna()
+    for code, text in st_text[st_text.index.isin(codes.unique())].items():
+        rows = codes == code
+        for start, end in parse_st_periods(text):
+            pct[rows & (dates >= start) & (dates <= end)] = ST_LIMIT_PCT
+    return pct.astype(float)
@@ -10,6 +10,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'i
 
 # === 引入工具函数 ===
 from log_utils import save_log_to_top
+from loader import list_stock_files, iter_stock_files
+from security_master import load_security_master, build_security_master, save_security_master, select_universe, universe_files
+from result_store import list_runs, load_run_meta, load_event_records, summarize_events, top_events, sample_events
+from market_state import update_market_state, load_market_state, attach_market_state, slice_by_state
+from adjust import ingest_price_dir, make_price_reader, with_price_basis, price_columns
+from minute_data import import_minute_csv, iter_minute_bars, read_minute_bars, add_minute_features
+from pattern import add_limit_flags, compile_pattern, run_pattern
+from sampling import stratify, estimate_groups, run_approximate
+from screener import init_screener_state, run_screener, append_latest_bars
 
 # === 引入回测策略 ===
 from model1 import run_model1
@@ -19,4 +28,4 @@ from model4 import run_zhaban_zt_buy_next_day_model
 from model5 import run_lianban_buy_model
 from model6 import run_zhuangting_fanbao_model
 from model7 import run_fanbao_drop5to10_prev_zt_model
-__all__ = ['save_log_to_top', 'run_model1','run_model2','run_drop20_model','run_zhaban_zt_buy_next_day_model','run_lianban_buy_model','run_zhuangting_fanbao_model','run_fanbao_drop5to10_prev_zt_model']
+__all__ = ['save_log_to_top', 'list_stock_files', 'iter_stock_files', 'load_security_master', 'build_security_master', 'save_security_master', 'select_universe', 'universe_files', 'list_runs', 'load_run_meta', 'load_event_records', 'summarize_events', 'top_events', 'sample_events', 'update_market_state', 'load_market_state', 'attach_market_state', 'slice_by_state', 'ingest_price_dir', 'make_price_reader', 'with_price_basis', 'price_columns', 'import_minute_csv', 'iter_minute_bars', 'read_minute_bars', 'add_minute_features', 'add_limit_flags', 'compile_pattern', 'run_pattern', 'stratify', 'estimate_groups', 'run_approximate', 'init_screener_state', 'run_screener', 'append_latest_bars', 'run_model1','run_model2','run_drop20_model','run_zhaban_zt_buy_next_day_model','run_lianban_buy_model','run_zhuangting_fanbao_model','run_fanbao_drop5to10_prev_zt_model']
@@ -14,8 +14,28 @@ cache_path = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..','..','mainData', 'cached_stock_data.pkl')
 )
 
+# 市场情绪表路径（逐日涨停数、炸板率、最高连板等）
+market_state_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..','..','mainData', 'market_state.csv')
+)
+
+# 复权因子路径（代码,交易日期,复权因子，只记录因子变动的日期）
+factor_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..','..','mainData', 'adj_factors.csv')
+)
+
+# 分钟数据路径（按 股票代码/YYYYMM.pkl.gz 分块存储）
+minute_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..','..','mainData', 'minute_data')
+)
+
+# 收盘选股状态路径（每只股票最近几天的滚动窗口）
+screener_state_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..','..','mainData', 'screener_state.pkl')
+)
+
 # 起止时间
 start_date_filter = pd.to_datetime('2024-12-01')
 end_date_filter = pd.to_datetime('2025-06-30')
 
-__all__ = ['file_path', 'cache_path', 'start_date_filter', 'end_date_filter']
+__all__ = ['file_path', 'cache_path', 'market_state_path', 'factor_path', 'minute_path', 'screener_state_path', 'start_date_filter', 'end_date_filter']
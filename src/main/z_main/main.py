@@ -7,6 +7,8 @@ from load_data import file_path, cache_path, start_date_filter, end_date_filter
 
 # === 调用策略方法 ===
 result_str = run_fanbao_drop5to10_prev_zt_model(file_path, start_date_filter, end_date_filter)
+# 快速估算：分层抽取 5% 股票，输出带置信区间的估计；target_error=0.005 则逐轮加样直到误差在 ±0.5% 以内
+# result_str = run_fanbao_drop5to10_prev_zt_model(file_path, start_date_filter, end_date_filter, sample_frac=0.05)
 # print(result_str)
 
 # === 打印到日志顶部 ===
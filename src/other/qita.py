@@ -1,6 +1,12 @@
 import os
+import sys
 import pandas as pd
 from technical import *
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main', 'until')))
+from adjust import make_price_reader, default_factor_path
+from loader import iter_stock_files
+from event_study import new_study, signal_returns, update_study, print_study
 pd.set_option('expand_frame_repr', False)  # 当列太多时不换行
 pd.set_option('display.max_rows', 5000)  # 最多显示数据的行数
 
@@ -10,6 +16,8 @@ day_list = [1, 2, 3, 5, 10, 20]
 # 测试时间段，可根据数据时间更改
 start_time = '20070101'
 end_time = '20220930'
+# 每批处理的股票数，只影响内存峰值，不影响结果
+batch_size = 200
 
 # ====获取所有股票数据的股票代码
 # 获取股票文件夹路径
@@ -17,43 +25,28 @@ file_path = os.path.abspath(os.path.dirname(__file__)) + '/股票数据/'  # 返
 # 获取文件夹下的所有csv文件的文件路径
 file_list = os.listdir(file_path)
 file_list = [f for f in file_list if '.csv' in f]
+read_price = make_price_reader('back', default_factor_path(file_path))
 
-# ====遍历每个股票
-tables = []
-for f in file_list:
+# ====分批遍历股票，只保留信号行，累加可合并的统计量
+study = new_study(day_list)
+batch = []
+for f, table in iter_stock_files(file_path, file_list, read_price):
     print(f)
-    # 读取这个数据的数据
-    table = pd.read_csv(os.path.join(file_path, f), encoding='gbk', parse_dates=['交易日期'])
+    if table is None or table.empty:
+        continue
 
     # 计算你需要的技术指标
     table = technical_indicator(table)
 
-    # 计算未来N日涨跌幅
-    for day in day_list:
-        table['%s日后涨跌幅' % day] = table['收盘价_复权'].shift(0 - day) / table['收盘价_复权'] - 1
-        table['%s日后是否上涨' % day] = table['%s日后涨跌幅' % day] > 0
-        table['%s日后是否上涨' % day].fillna(value=False, inplace=True)
-
-    # 选取制定时间范围内的股票
-    table = table[table['交易日期'] >= pd.to_datetime(start_time)]
-    table = table[table['交易日期'] <= pd.to_datetime(end_time)]
+    # 计算未来N日涨跌幅，并选取制定时间范围内的信号行
+    batch.append(signal_returns(table, day_list, start_time, end_time))
 
-    tables.append(table)
-
-all_table = pd.concat(tables, ignore_index=True)
+    if len(batch) >= batch_size:
+        update_study(study, pd.concat(batch, ignore_index=True), day_list)
+        batch = []
+if batch:
+    update_study(study, pd.concat(batch, ignore_index=True), day_list)
 
 # =====分析数据
 # 计算N日后涨跌幅大于0的概率
-for signal, group in all_table.groupby('signal'):
-    if signal == 1:
-        print('\n', '=' * 10, '看涨信号', '=' * 10)
-    elif signal == 0:
-        print('\n', '=' * 10, '看跌信号', '=' * 10)
-    print(group[[str(i) + '日后涨跌幅' for i in day_list]].describe())
-    
-    for i in day_list:
-        if signal == 1:
-            print(str(i) + '天后涨跌幅大于0概率', '\t', float(group[group[str(i) + '日后涨跌幅'] > 0].shape[0]) / group.shape[0])
-        elif signal == 0:
-            print(str(i) + '天后涨跌幅小于0概率', '\t', float(group[group[str(i) + '日后涨跌幅'] < 0].shape[0]) / group.shape[0])
-
+print_study(study, day_list)